@@ -2,7 +2,7 @@
 {
     'name': 'ACMST Admissions',
     'summary': 'Admissions portal with lookup, OTP auth, profile, and PDF form',
-    'version': '17.0.1.0.0',
+    'version': '17.0.1.1.0',
     'category': 'Website',
     'author': 'ACMST',
     'website': 'https://example.com',
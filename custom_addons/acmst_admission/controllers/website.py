@@ -1,6 +1,58 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 from odoo import http, fields
-from odoo.http import request
-from ..models.utils import normalize_arabic, to_western_digits
+from odoo.http import content_disposition, request
+from ..models import http_client
+from ..models.utils import normalize_arabic, normalize_name_key, to_western_digits
+
+
+# Lookup shows at most this many matches
+LOOKUP_MAX_RESULTS = 20
+
+
+class RecaptchaCache:
+    """Per-process verification results keyed by sha256(token|ip), kept for
+    ``ttl`` seconds, with hit/miss counters."""
+
+    def __init__(self, ttl=120, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, ok)
+        self._counters = {'session_hits': 0, 'cache_hits': 0, 'misses': 0}
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._counters['cache_hits'] += 1
+                return entry[1]
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, key, ok, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, ok)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self):
+        with self._lock:
+            total = sum(self._counters.values())
+            hits = self._counters['session_hits'] + self._counters['cache_hits']
+            return dict(self._counters, size=len(self._entries),
+                        hit_rate=round(hits / total, 3) if total else 0.0)
+
+
+_recaptcha_cache = RecaptchaCache()
 
 
 class AdmissionsWebsite(http.Controller):
@@ -18,11 +70,11 @@ class AdmissionsWebsite(http.Controller):
             'query': kwargs,
             'programs': programs,
             'years': years,
-            'recaptcha_site_key': env['ir.config_parameter'].sudo().get_param('acmst_admission.recaptcha_site_key') or '',
+            'recaptcha_site_key': env['admissions.settings'].get_config().recaptcha_site_key,
         }
         if request.httprequest.method == 'POST':
             ip = request.httprequest.remote_addr or '0.0.0.0'
-            settings = env['admissions.settings'].sudo().search([], limit=1) or env['admissions.settings']
+            settings = env['admissions.settings'].get_config()
             window = settings.rate_limit_window_minutes or 15
             max_hits = 30  # per window for lookup
             limited = env['admissions.rate.limit'].sudo().is_limited('lookup', ip, window, max_hits)
@@ -47,53 +99,29 @@ class AdmissionsWebsite(http.Controller):
             year_code = (kwargs.get('year_code') or '').strip()
 
             domain = []
+            program_id = year_id = None
             if program_code:
                 prog = env['admissions.program'].sudo().search([('code', '=', program_code)], limit=1)
                 if prog:
-                    domain.append(('program_id', '=', prog.id))
+                    program_id = prog.id
+                    domain.append(('program_id', '=', program_id))
             if year_code:
                 year = env['admissions.year'].sudo().search([('code', '=', year_code)], limit=1)
                 if year:
-                    domain.append(('academic_year_id', '=', year.id))
-
-            # Tier 1: Exact normalized match on all provided Arabic name parts
-            candidates = env['admissions.candidate'].sudo().search(domain, limit=500)
-            def norm(s):
-                return (normalize_arabic(s or '') or '').lower()
-            results = []
-            for c in candidates:
-                if first_ar and norm(c.first_ar) != norm(first_ar):
-                    continue
-                if second_ar and norm(c.second_ar) != norm(second_ar):
-                    continue
-                if third_ar and norm(c.third_ar) != norm(third_ar):
-                    continue
-                if fourth_ar and norm(c.fourth_ar) != norm(fourth_ar):
-                    continue
-                results.append({
-                    'id': c.id,
-                    'name_ar': ' '.join(filter(None, [c.first_ar, c.second_ar, c.third_ar, c.fourth_ar])),
-                    'uid': c.combined_university_id or '',
-                    'masked_id': (c.combined_university_id or '')[-4:],
-                })
-            # Tier 2: Soft match allowing one missing middle name
+                    year_id = year.id
+                    domain.append(('academic_year_id', '=', year_id))
+
+            Candidate = env['admissions.candidate'].sudo()
+            query_parts = {'first_ar': first_ar, 'second_ar': second_ar, 'third_ar': third_ar, 'fourth_ar': fourth_ar}
+            # Tier 1: Exact normalized match on all provided Arabic name parts (indexed SQL)
+            results = [self._lookup_result(c) for c in Candidate._lookup_exact(domain, query_parts, limit=LOOKUP_MAX_RESULTS)]
+            # Tier 2: Soft match allowing one missing middle name (token index)
             if not results and any([first_ar, second_ar, third_ar, fourth_ar]):
-                for c in candidates:
-                    parts_q = [p for p in [first_ar, second_ar, third_ar, fourth_ar] if p]
-                    parts_c = [normalize_arabic(p) for p in [c.first_ar, c.second_ar, c.third_ar, c.fourth_ar] if p]
-                    # Allow one token difference
-                    matches = sum(1 for p in parts_q if normalize_arabic(p) in parts_c)
-                    if matches >= max(1, len(parts_q) - 1):
-                        results.append({
-                            'id': c.id,
-                            'name_ar': ' '.join(filter(None, [c.first_ar, c.second_ar, c.third_ar, c.fourth_ar])),
-                            'uid': c.combined_university_id or '',
-                            'masked_id': (c.combined_university_id or '')[-4:],
-                        })
+                results = [self._lookup_result(c) for c in Candidate._lookup_tokens(query_parts, program_id, year_id, limit=LOOKUP_MAX_RESULTS)]
             # Tier 3: Fuzzy ratio using difflib on concatenated names and token-level average
             if not results and any([first_ar, second_ar, third_ar, fourth_ar]):
                 # Prefer rapidfuzz if available; fallback to difflib
-                query_tokens = [t for t in normalize_arabic(' '.join(filter(None, [first_ar, second_ar, third_ar, fourth_ar]))).split(' ') if t]
+                query_tokens = [t for t in normalize_name_key(' '.join(filter(None, [first_ar, second_ar, third_ar, fourth_ar]))).split(' ') if t]
                 try:
                     from rapidfuzz import fuzz
                     def score(a, b):
@@ -103,8 +131,9 @@ class AdmissionsWebsite(http.Controller):
                     def score(a, b):
                         return difflib.SequenceMatcher(None, a, b).ratio()
                 query_name = ' '.join(query_tokens)
-                for c in candidates:
-                    cand_tokens = [t for t in normalize_arabic(' '.join(filter(None, [c.first_ar, c.second_ar, c.third_ar, c.fourth_ar]))).split(' ') if t]
+                # Only the trigram shortlist is scored in Python
+                for c in Candidate._lookup_fuzzy_shortlist(query_name, program_id, year_id):
+                    cand_tokens = [t for t in (c.name_norm_ar or '').split(' ') if t]
                     cand_name = ' '.join(cand_tokens)
                     ratio = score(query_name, cand_name)
                     token_scores = []
@@ -118,15 +147,19 @@ class AdmissionsWebsite(http.Controller):
                             token_scores.append(best)
                     avg_token = sum(token_scores) / len(token_scores) if token_scores else 0
                     if ratio >= 0.8 or avg_token >= 0.85:
-                        results.append({
-                            'id': c.id,
-                            'name_ar': ' '.join(filter(None, [c.first_ar, c.second_ar, c.third_ar, c.fourth_ar])),
-                            'uid': c.combined_university_id or '',
-                            'masked_id': (c.combined_university_id or '')[-4:],
-                        })
-            values['results'] = results[:20]
+                        results.append(self._lookup_result(c))
+            values['results'] = results[:LOOKUP_MAX_RESULTS]
         return request.render('acmst_admission.lookup', values)
 
+    @staticmethod
+    def _lookup_result(c):
+        return {
+            'id': c.id,
+            'name_ar': ' '.join(filter(None, [c.first_ar, c.second_ar, c.third_ar, c.fourth_ar])),
+            'uid': c.combined_university_id or '',
+            'masked_id': (c.combined_university_id or '')[-4:],
+        }
+
     @http.route('/admissions/use_id', type='http', auth='public', website=True)
     def admissions_use_id(self, id=None, **kwargs):
         if not id:
@@ -156,6 +189,36 @@ class AdmissionsWebsite(http.Controller):
             ],
         )
 
+    @staticmethod
+    def _get_import_job(job_id):
+        """Import job ``job_id`` if the current user may manage imports."""
+        user = request.env.user
+        if not (user.has_group('acmst_admission.group_admissions_admin') or user.has_group('acmst_admission.group_admissions_officer')
+                or user.has_group('base.group_system')):
+            return request.env['admissions.import.job']
+        return request.env['admissions.import.job'].browse(job_id).exists()
+
+    @http.route('/admissions/import/<int:job_id>/progress', type='http', auth='user', methods=['GET'])
+    def admissions_import_progress(self, job_id, **kwargs):
+        job = self._get_import_job(job_id)
+        if not job:
+            return request.not_found()
+        return request.make_json_response(job.get_progress())
+
+    @http.route('/admissions/import/<int:job_id>/errors.csv', type='http', auth='user')
+    def admissions_import_errors_csv(self, job_id, **kwargs):
+        job = self._get_import_job(job_id)
+        if not job:
+            return request.not_found()
+        filename = job.errors_csv_filename or 'import_errors.csv'
+        return request.make_response(
+            job._errors_csv(),
+            headers=[
+                ('Content-Type', 'text/csv; charset=utf-8'),
+                ('Content-Disposition', content_disposition(filename)),
+            ],
+        )
+
     @http.route('/admissions/admin/export', type='http', auth='user')
     def admissions_export_csv(self, **kwargs):
         # Admin/officer-only CSV export of candidates
@@ -182,11 +245,19 @@ class AdmissionsWebsite(http.Controller):
             headers=[('Content-Type','text/csv; charset=utf-8'), ('Content-Disposition','attachment; filename="admissions_export.csv"')]
         )
 
+    @http.route('/admissions/admin/metrics', type='http', auth='user')
+    def admissions_metrics(self, **kwargs):
+        # Admin-only counters of this worker process
+        user = request.env.user
+        if not (user.has_group('acmst_admission.group_admissions_admin') or user.has_group('base.group_system')):
+            return request.not_found()
+        return request.make_json_response({'http': http_client.stats(), 'recaptcha': _recaptcha_cache.stats()})
+
     @http.route('/admissions/auth', type='http', auth='public', website=True, csrf=True, methods=['GET', 'POST'])
     def admissions_auth(self, **kwargs):
         env = request.env
         values = {'error': None,
-                  'recaptcha_site_key': env['ir.config_parameter'].sudo().get_param('acmst_admission.recaptcha_site_key') or ''}
+                  'recaptcha_site_key': env['admissions.settings'].get_config().recaptcha_site_key}
         if request.httprequest.method == 'POST':
             # Optional reCAPTCHA
             token = kwargs.get('g-recaptcha-response')
@@ -222,7 +293,7 @@ class AdmissionsWebsite(http.Controller):
             return request.redirect('/admissions/auth')
         values = {
             'error': None,
-            'recaptcha_site_key': env['ir.config_parameter'].sudo().get_param('acmst_admission.recaptcha_site_key') or '',
+            'recaptcha_site_key': env['admissions.settings'].get_config().recaptcha_site_key,
         }
         if request.httprequest.method == 'POST':
             phone = kwargs.get('phone')
@@ -242,7 +313,7 @@ class AdmissionsWebsite(http.Controller):
         # Optional reCAPTCHA verification
         if not self._verify_recaptcha(recaptcha_token, ip):
             return {'ok': False, 'message': 'reCAPTCHA validation failed.'}
-        settings = env['admissions.settings'].sudo().search([], limit=1) or env['admissions.settings']
+        settings = env['admissions.settings'].get_config()
         window = settings.rate_limit_window_minutes or 15
         if env['admissions.rate.limit'].sudo().is_limited('otp_send', ip, window, settings.rate_limit_sends_per_window or 3):
             return {'ok': False, 'message': 'Too many OTP requests. Please wait.'}
@@ -253,10 +324,7 @@ class AdmissionsWebsite(http.Controller):
             return {'ok': False, 'message': 'No phone in session.'}
 
         # Blacklist check
-        raw_blacklist = request.env['ir.config_parameter'].sudo().get_param('acmst_admission.blacklist_phones') or ''
-        import re
-        blacklist = [p.strip() for p in re.split(r'[\s,;]+', raw_blacklist) if p.strip()]
-        if phone in blacklist:
+        if phone in settings.blacklist_phones:
             return {'ok': False, 'message': 'Phone number is not allowed.'}
 
         # Per-phone daily cap
@@ -328,7 +396,7 @@ class AdmissionsWebsite(http.Controller):
         import hashlib
         if rec.status in ('ok', 'exp'):
             return {'ok': False, 'message': 'OTP already used or expired.'}
-        if rec.attempts >= (env['admissions.settings'].sudo().search([], limit=1).verify_attempts_per_code or 5):
+        if rec.attempts >= (env['admissions.settings'].get_config().verify_attempts_per_code or 5):
             rec.write({'status': 'bad'})
             return {'ok': False, 'message': 'Too many attempts.'}
         code_hash = hashlib.sha256((code + (rec.salt or '')).encode()).hexdigest()
@@ -458,7 +526,7 @@ class AdmissionsWebsite(http.Controller):
         # Optional reCAPTCHA verification
         if not self._verify_recaptcha(recaptcha_token, ip):
             return {'ok': False, 'message': 'reCAPTCHA validation failed.'}
-        settings = env['admissions.settings'].sudo().search([], limit=1) or env['admissions.settings']
+        settings = env['admissions.settings'].get_config()
         window = settings.rate_limit_window_minutes or 15
         if env['admissions.rate.limit'].sudo().is_limited('otp_send', ip, window, settings.rate_limit_sends_per_window or 3):
             return {'ok': False, 'message': 'Too many OTP requests. Please wait.'}
@@ -479,13 +547,18 @@ class AdmissionsWebsite(http.Controller):
         request.session['admissions_phone'] = phone
 
         # Blacklist check
-        raw_blacklist = request.env['ir.config_parameter'].sudo().get_param('acmst_admission.blacklist_phones') or ''
-        import re
-        blacklist = [p.strip() for p in re.split(r'[\s,;]+', raw_blacklist) if p.strip()]
-        if phone in blacklist:
+        if phone in settings.blacklist_phones:
             return {'ok': False, 'message': 'Phone number is not allowed.'}
 
-        # Generate and send OTP via WhatsApp (Brevo)
+        # Provider must be configured before an OTP is issued
+        if not (settings.brevo_api_key and settings.brevo_sender):
+            request.env['ir.logging'].sudo().create({
+                'name': 'Brevo OTP Send', 'type': 'server', 'level': 'WARNING',
+                'message': 'Brevo send failed: Brevo API not configured', 'path': __name__, 'func': 'admissions_otp_send', 'line': 0,
+            })
+            return {'ok': False, 'message': 'Provider not configured. Contact support.'}
+
+        # Generate OTP and queue it for WhatsApp delivery (Brevo), sent by the outbox cron
         import secrets, hashlib
         length = settings.otp_length or 6
         code = ''.join(secrets.choice('0123456789') for _ in range(length))
@@ -493,13 +566,13 @@ class AdmissionsWebsite(http.Controller):
         code_hash = hashlib.sha256((code + salt).encode()).hexdigest()
         from datetime import timedelta
         expire_at = fields.Datetime.now() + timedelta(minutes=int(settings.otp_ttl_minutes or 10))
-        env['admissions.otp'].sudo().create({
+        otp = env['admissions.otp'].sudo().create({
             'phone': phone,
             'purpose': 'login',
             'code_hash': code_hash,
             'salt': salt,
             'expire_at': expire_at,
-            'status': 'sent',
+            'status': 'new',
             'ip': ip,
             'user_agent': request.httprequest.headers.get('User-Agent'),
         })
@@ -510,67 +583,44 @@ class AdmissionsWebsite(http.Controller):
             cand = env['admissions.candidate'].sudo().browse(int(cand_id))
             if cand.exists():
                 name_param = ' '.join([p for p in [cand.first_ar, cand.second_ar, cand.third_ar, cand.fourth_ar] if p])
-        try:
-            self._send_brevo_whatsapp(phone, code, name_param)
-            return {'ok': True, 'message': 'OTP sent via WhatsApp'}
-        except Exception as e:
-            request.env['ir.logging'].sudo().create({
-                'name': 'Brevo OTP Send', 'type': 'server', 'level': 'WARNING',
-                'message': f'Brevo send failed: {e}', 'path': __name__, 'func': '_send_brevo_whatsapp', 'line': 0,
-            })
-            return {'ok': False, 'message': 'Provider not configured. Contact support.'}
+        env['admissions.otp.outbox'].enqueue(otp, code, name_param)
+        return {'ok': True, 'message': 'OTP sent via WhatsApp'}
 
     # Provider hook
     def _send_brevo_whatsapp(self, phone_e164: str, otp_code: str, name_param: str = ''):
-        # Realistic Brevo WhatsApp template send
-        # Configure these system params: acmst_admission.brevo_api_key, acmst_admission.brevo_sender, acmst_admission.brevo_template, acmst_admission.brevo_language
-        ICP = request.env['ir.config_parameter'].sudo()
-        api_key = ICP.get_param('acmst_admission.brevo_api_key')
-        sender = ICP.get_param('acmst_admission.brevo_sender')  # WhatsApp sender number (international format)
-        template = ICP.get_param('acmst_admission.brevo_template') or 'otp'
-        language = ICP.get_param('acmst_admission.brevo_language') or 'ar'
-        if not (api_key and sender):
-            raise Exception('Brevo API not configured')
-        import requests
-        headers = {
-            'accept': 'application/json',
-            'api-key': api_key,
-            'content-type': 'application/json',
-        }
-        payload = {
-            'senderNumber': sender,
-            'contactNumber': phone_e164,
-            'templateName': template,
-            # Match your template variables: {{name}} and {{otp}}
-            'params': {'name': name_param or '', 'otp': otp_code},
-            'language': language,
-        }
-        url = 'https://api.brevo.com/v3/whatsapp/sendTemplate'
-        resp = requests.post(url, headers=headers, json=payload, timeout=10)
-        if resp.status_code >= 300:
-            raise Exception(f'Brevo error {resp.status_code}: {resp.text}')
+        # Synchronous Brevo WhatsApp template send; the OTP route queues through admissions.otp.outbox instead
+        request.env['admissions.otp.outbox'].sudo()._send_now(phone_e164, otp_code, name_param)
 
     def _verify_recaptcha(self, token: str, ip: str) -> bool:
-        ICP = request.env['ir.config_parameter'].sudo()
-        secret = ICP.get_param('acmst_admission.recaptcha_secret_key')
+        config = request.env['admissions.settings'].get_config()
+        secret = config.recaptcha_secret_key
         if not secret:
             return True  # not configured; skip enforcement
+        now = time.time()
+        # A challenge passed earlier in this session covers the next steps of the flow
+        if request.session.get('admissions_recaptcha_until', 0) > now:
+            _recaptcha_cache.count('session_hits')
+            return True
         if not token:
             return False
-        import requests
-        data = {'secret': secret, 'response': token, 'remoteip': ip}
-        try:
-            r = requests.post('https://www.google.com/recaptcha/api/siteverify', data=data, timeout=5)
-            ok = r.json().get('success') is True
-            return ok
-        except Exception:
-            return False
+        key = hashlib.sha256(f'{token}|{ip}'.encode()).hexdigest()
+        ok = _recaptcha_cache.get(key, now)
+        if ok is None:
+            data = {'secret': secret, 'response': token, 'remoteip': ip}
+            try:
+                r = http_client.post('recaptcha', 'https://www.google.com/recaptcha/api/siteverify', data=data)
+                ok = r.json().get('success') is True
+            except Exception:
+                return False
+            _recaptcha_cache.put(key, ok, now)
+        if ok and config.recaptcha_grace_seconds:
+            request.session['admissions_recaptcha_until'] = now + config.recaptcha_grace_seconds
+        return ok
 
     @http.route('/admissions/brevo/webhook', type='http', auth='public', csrf=False, methods=['POST'])
     def brevo_webhook(self, **kwargs):
         # Basic webhook endpoint for Brevo callbacks; validates optional secret token
-        ICP = request.env['ir.config_parameter'].sudo()
-        secret = ICP.get_param('acmst_admission.brevo_webhook_secret')
+        secret = request.env['admissions.settings'].get_config().brevo_webhook_secret
         token = request.httprequest.headers.get('X-Webhook-Token') or request.params.get('token')
         if secret and token != secret:
             return request.make_response('Forbidden', [('Content-Type', 'text/plain')], 403)
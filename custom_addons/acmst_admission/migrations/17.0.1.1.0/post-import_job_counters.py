@@ -0,0 +1,21 @@
+from odoo.tools.sql import column_exists
+
+# The processed/imported/rejected counters of an import job are now summed
+# over its chunks. Jobs finished before chunks existed get one done chunk
+# holding their stored counters, which are then dropped.
+COUNTER_COLUMNS = ('processed', 'imported', 'rejected')
+
+
+def migrate(cr, version):
+    if not all(column_exists(cr, 'admissions_import_job', column) for column in COUNTER_COLUMNS):
+        return
+    cr.execute("""
+        INSERT INTO admissions_import_chunk (job_id, start, stop, state, processed, imported, rejected, attempts)
+        SELECT j.id, 0, GREATEST(COALESCE(j.total, 0), COALESCE(j.processed, 0)), 'done',
+               COALESCE(j.processed, 0), COALESCE(j.imported, 0), COALESCE(j.rejected, 0), 0
+          FROM admissions_import_job j
+         WHERE j.state IN ('done', 'error', 'cancelled')
+           AND NOT EXISTS (SELECT 1 FROM admissions_import_chunk c WHERE c.job_id = j.id)
+    """)
+    for column in COUNTER_COLUMNS:
+        cr.execute(f"ALTER TABLE admissions_import_job DROP COLUMN {column}")
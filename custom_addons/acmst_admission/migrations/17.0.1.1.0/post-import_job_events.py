@@ -0,0 +1,55 @@
+import csv
+import re
+from io import StringIO
+
+from odoo import SUPERUSER_ID, api
+from odoo.tools.sql import column_exists
+
+# The log of an import job used to be one stored text, appended to as
+# "[<datetime>] <message>" lines, and its rejected rows a stored CSV
+# attachment. Both are now admissions.import.event rows.
+LOG_LINE = re.compile(r'^\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(?:\.\d+)?\] ?(.*)$')
+
+
+def _log_events(job_id, text, default_at):
+    events = []
+    for line in text.splitlines():
+        match = LOG_LINE.match(line)
+        if match:
+            events.append({'job_id': job_id, 'kind': 'log', 'at': match[1], 'message': match[2]})
+        elif events:
+            # Continuation of a multi-line message
+            events[-1]['message'] += '\n' + line
+        elif line.strip():
+            events.append({'job_id': job_id, 'kind': 'log', 'at': default_at, 'message': line})
+    return events
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Event = env['admissions.import.event']
+
+    if column_exists(cr, 'admissions_import_job', 'log'):
+        cr.execute("""
+            SELECT id, log, create_date FROM admissions_import_job
+             WHERE log IS NOT NULL AND log != ''
+             ORDER BY id
+        """)
+        vals_list = []
+        for job_id, text, create_date in cr.fetchall():
+            vals_list += _log_events(job_id, text, create_date)
+        Event.create(vals_list)
+        cr.execute("ALTER TABLE admissions_import_job DROP COLUMN log")
+
+    attachments = env['ir.attachment'].search([
+        ('res_model', '=', 'admissions.import.job'), ('res_field', '=', 'errors_csv'),
+    ])
+    job_ids = set(env['admissions.import.job'].browse(attachments.mapped('res_id')).exists().ids)
+    for attachment in attachments.filtered(lambda a: a.res_id in job_ids):
+        reader = csv.reader(StringIO((attachment.raw or b'').decode('utf-8', 'replace')))
+        Event.create([
+            {'job_id': attachment.res_id, 'kind': 'error', 'row': int(row), 'message': reason}
+            for row, reason, *_rest in (line for line in reader if len(line) >= 2)
+            if row.isdigit()
+        ])
+    attachments.unlink()
@@ -0,0 +1,13 @@
+# The reCAPTCHA grace period moved from an ir.config_parameter, which could
+# not hold 0, to admissions.settings. Carry an explicitly saved value over.
+
+
+def migrate(cr, version):
+    cr.execute("""
+        DELETE FROM ir_config_parameter
+         WHERE key = 'acmst_admission.recaptcha_grace_seconds'
+     RETURNING value
+    """)
+    row = cr.fetchone()
+    if row and row[0] and row[0].strip().lstrip('-').isdigit():
+        cr.execute("UPDATE admissions_settings SET recaptcha_grace_seconds = %s", [int(row[0])])
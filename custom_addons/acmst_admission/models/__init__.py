@@ -3,8 +3,13 @@ from . import year
 from . import settings
 from . import otp
 from . import candidate
+from . import candidate_token
 from . import utils
 from . import rate_limit
 from . import res_config_settings
 from . import otp_log
+from . import otp_outbox
 from . import import_job
+from . import import_row
+from . import import_chunk
+from . import import_event
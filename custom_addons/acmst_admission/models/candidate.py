@@ -1,4 +1,40 @@
-from odoo import api, fields, models
+import logging
+from collections import Counter
+from io import StringIO
+
+from odoo import api, fields, models, tools
+from odoo.tools.sql import constraint_definition
+from .utils import normalize_name_key, normalize_name_keys
+
+_logger = logging.getLogger(__name__)
+
+
+NAME_PARTS_AR = ('first_ar', 'second_ar', 'third_ar', 'fourth_ar')
+# Writes to these fields refresh admissions.candidate.token
+NAME_TOKEN_FIELDS = frozenset(NAME_PARTS_AR + ('program_id', 'academic_year_id'))
+
+# Fuzzy lookup: pg_trgm shortlist size and minimum trigram similarity
+FUZZY_SHORTLIST_SIZE = 50
+FUZZY_SIMILARITY_THRESHOLD = 0.3
+# Rows scanned in Python when pg_trgm is not installed
+FUZZY_SCAN_LIMIT = 500
+
+# Columns written by the COPY-based import upsert (see _import_upsert)
+IMPORT_COPY_COLUMNS = (
+    'base_university_id', 'program_id', 'academic_year_id',
+    'first_ar', 'second_ar', 'third_ar', 'fourth_ar',
+    'first_en', 'second_en', 'third_en', 'fourth_en',
+    'national_id', 'dob', 'import_job_id',
+    'first_ar_norm', 'second_ar_norm', 'third_ar_norm', 'fourth_ar_norm', 'name_norm_ar',
+)
+
+
+def _copy_csv_line(values):
+    """One COPY CSV line: None is written unquoted, which COPY reads as NULL,
+    every other value is quoted so empty strings stay empty strings."""
+    return ','.join(
+        '' if v is None else '"%s"' % str(v).replace('"', '""') for v in values
+    ) + '\n'
 
 
 class AdmissionsCandidate(models.Model):
@@ -31,6 +67,44 @@ class AdmissionsCandidate(models.Model):
     partner_id = fields.Many2one('res.partner', string='Partner')
     import_job_id = fields.Many2one('admissions.import.job', string='Import Job', index=True)
 
+    # Normalized lookup keys (see utils.normalize_name_key), maintained by the ORM
+    first_ar_norm = fields.Char(compute='_compute_name_norm', store=True, index=True)
+    second_ar_norm = fields.Char(compute='_compute_name_norm', store=True, index=True)
+    third_ar_norm = fields.Char(compute='_compute_name_norm', store=True, index=True)
+    fourth_ar_norm = fields.Char(compute='_compute_name_norm', store=True, index=True)
+    name_norm_ar = fields.Char(string='Normalized Name (AR)', compute='_compute_name_norm', store=True, index=True)
+
+    _sql_constraints = [
+        ('candidate_import_key_unique', 'unique(base_university_id, program_id, academic_year_id)',
+         'A candidate with this base ID already exists for the program and academic year.'),
+    ]
+
+    def init(self):
+        super().init()
+        cr = self.env.cr
+        if not self.env.registry.has_trigram:
+            try:
+                with cr.savepoint(flush=False):
+                    cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            except Exception as e:
+                _logger.info("pg_trgm unavailable, fuzzy lookup will use a bounded scan: %s", e)
+                return
+            self.env.registry.has_trigram = True
+        tools.create_index(cr, 'admissions_candidate_name_norm_ar_trgm_idx', self._table,
+                           ['"name_norm_ar" gin_trgm_ops'], method='gin')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._sync_name_tokens()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if NAME_TOKEN_FIELDS.intersection(vals):
+            self._sync_name_tokens()
+        return res
+
     @api.depends('base_university_id', 'academic_year_id', 'academic_year_id.code')
     def _compute_combined_university_id(self):
         for rec in self:
@@ -43,3 +117,204 @@ class AdmissionsCandidate(models.Model):
                 if years:
                     tail4 = max(years)
             rec.combined_university_id = f"{base}{tail4}"
+
+    @api.depends(*NAME_PARTS_AR)
+    def _compute_name_norm(self):
+        all_keys = iter(normalize_name_keys(rec[f] for rec in self for f in NAME_PARTS_AR))
+        for rec in self:
+            keys = [next(all_keys) for _f in NAME_PARTS_AR]
+            for f, key in zip(NAME_PARTS_AR, keys):
+                rec[f + '_norm'] = key
+            rec.name_norm_ar = ' '.join(k for k in keys if k)
+
+    @api.model
+    def _lookup_exact(self, domain, parts, limit=None):
+        """Tier 1 lookup: candidates whose normalized name parts equal every
+        provided part of ``parts`` (a dict keyed by NAME_PARTS_AR). Runs as a
+        single indexed query over the ``*_norm`` columns."""
+        domain = list(domain)
+        for f in NAME_PARTS_AR:
+            key = normalize_name_key(parts.get(f))
+            if key:
+                domain.append((f + '_norm', '=', key))
+        return self.search(domain, limit=limit)
+
+    @api.model
+    def _get_ids_by_import_key(self, keys):
+        """Map (base_university_id, program_id, academic_year_id) keys to the ids
+        of existing candidates, in one query."""
+        if not keys:
+            return {}
+        self.flush_model(['base_university_id', 'program_id', 'academic_year_id'])
+        bases, programs, years = zip(*keys)
+        self.env.cr.execute("""
+            SELECT c.base_university_id, c.program_id, c.academic_year_id, c.id
+              FROM admissions_candidate c
+              JOIN unnest(%s::varchar[], %s::int[], %s::int[]) AS k(base, program_id, year_id)
+                ON c.base_university_id = k.base
+               AND c.program_id = k.program_id
+               AND c.academic_year_id = k.year_id
+        """, [list(bases), list(programs), list(years)])
+        return {(base, program_id, year_id): cid for base, program_id, year_id, cid in self.env.cr.fetchall()}
+
+    @api.model
+    def _has_import_key_constraint(self):
+        """Whether the unique import key constraint exists in the database. It
+        is not installed when candidates already held duplicate keys, and the
+        ON CONFLICT upsert needs it."""
+        return bool(constraint_definition(
+            self.env.cr, self._table, f'{self._table}_candidate_import_key_unique'))
+
+    @api.model
+    def _import_upsert(self, vals_list):
+        """Insert or update candidates from import ``vals_list`` without the ORM:
+        rows are streamed into a temporary table with COPY and merged with one
+        INSERT ... ON CONFLICT on the import key. Stored computes are filled in
+        here (normalized names in Python, combined_university_id in SQL), the
+        token index is refreshed and the ORM cache invalidated.
+        Returns the ids of the inserted or updated candidates."""
+        if not vals_list:
+            return []
+        cr = self.env.cr
+        self.flush_model()
+        buf = StringIO()
+        all_keys = iter(normalize_name_keys(vals.get(f) for vals in vals_list for f in NAME_PARTS_AR))
+        for vals in vals_list:
+            keys = [next(all_keys) for _f in NAME_PARTS_AR]
+            row = dict(vals, name_norm_ar=' '.join(k for k in keys if k),
+                       **{f + '_norm': key for f, key in zip(NAME_PARTS_AR, keys)})
+            try:
+                row['dob'] = fields.Date.to_date(row.get('dob'))
+            except ValueError:
+                row['dob'] = None
+            # NULL where the ORM would store NULL: missing keys, None and False
+            buf.write(_copy_csv_line(
+                None if row.get(col) is None or row.get(col) is False else row[col]
+                for col in IMPORT_COPY_COLUMNS
+            ))
+        buf.seek(0)
+        columns = ', '.join(IMPORT_COPY_COLUMNS)
+        column_defs = ', '.join(f"{col} {self._fields[col].column_type[1]}" for col in IMPORT_COPY_COLUMNS)
+        cr.execute(f"CREATE TEMP TABLE IF NOT EXISTS admissions_candidate_import_tmp ({column_defs}) ON COMMIT DROP")
+        cr.execute("TRUNCATE admissions_candidate_import_tmp")
+        cr.copy_expert(f"COPY admissions_candidate_import_tmp ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+        updates = ', '.join(f"{col} = EXCLUDED.{col}" for col in IMPORT_COPY_COLUMNS if col != 'dob')
+        cr.execute(f"""
+            INSERT INTO {self._table} ({columns}, combined_university_id, is_active,
+                                       create_uid, create_date, write_uid, write_date)
+            SELECT {', '.join('t.' + col for col in IMPORT_COPY_COLUMNS)},
+                   t.base_university_id || COALESCE(
+                       (SELECT max(m[1]) FROM regexp_matches(y.code, '[0-9]{{4}}', 'g') AS m), ''),
+                   TRUE, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM admissions_candidate_import_tmp t
+              LEFT JOIN admissions_year y ON y.id = t.academic_year_id
+            ON CONFLICT (base_university_id, program_id, academic_year_id) DO UPDATE
+               SET {updates},
+                   dob = COALESCE(EXCLUDED.dob, {self._table}.dob),
+                   combined_university_id = EXCLUDED.combined_university_id,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+            RETURNING id
+        """, {'uid': self.env.uid})
+        ids = [r[0] for r in cr.fetchall()]
+        self.invalidate_model()
+        self._insert_name_tokens("c.id = ANY(%s)", [ids])
+        return ids
+
+    def _sync_name_tokens(self):
+        """Replace the admissions.candidate.token rows of these candidates with
+        their current normalized name parts."""
+        if not self.ids:
+            return
+        self.flush_recordset(['first_ar_norm', 'second_ar_norm', 'third_ar_norm', 'fourth_ar_norm',
+                              'program_id', 'academic_year_id'])
+        self._insert_name_tokens("c.id = ANY(%s)", [self.ids])
+
+    def _insert_name_tokens(self, where, params):
+        Token = self.env['admissions.candidate.token']
+        cr = self.env.cr
+        cr.execute(f"DELETE FROM {Token._table} WHERE candidate_id IN (SELECT c.id FROM {self._table} c WHERE {where})", params)
+        cr.execute(f"""
+            INSERT INTO {Token._table} (candidate_id, token, program_id, academic_year_id)
+            SELECT DISTINCT c.id, t.token, c.program_id, c.academic_year_id
+              FROM {self._table} c
+             CROSS JOIN LATERAL unnest(ARRAY[c.first_ar_norm, c.second_ar_norm, c.third_ar_norm, c.fourth_ar_norm]) AS t(token)
+             WHERE ({where}) AND COALESCE(t.token, '') <> ''
+        """, params)
+        Token.invalidate_model()
+
+    @api.model
+    def _init_name_tokens(self):
+        """Backfill the token index on install/upgrade when it is still empty."""
+        Token = self.env['admissions.candidate.token']
+        self.env.cr.execute(f"SELECT 1 FROM {Token._table} LIMIT 1")
+        if self.env.cr.fetchone():
+            return
+        self.flush_model()
+        self._insert_name_tokens("TRUE", [])
+
+    @api.model
+    def _lookup_tokens(self, parts, program_id=None, academic_year_id=None, limit=None):
+        """Tier 2 lookup: candidates sharing all but at most one of the provided
+        name parts, resolved from the token posting lists."""
+        keys = [normalize_name_key(parts.get(f)) for f in NAME_PARTS_AR]
+        weights = Counter(k for k in keys if k)
+        if not weights:
+            return self.browse()
+        required = max(1, sum(weights.values()) - 1)
+        Token = self.env['admissions.candidate.token']
+        Token.flush_model()
+        where = []
+        params = [list(weights), list(weights.values())]
+        if program_id:
+            where.append('t.program_id = %s')
+            params.append(program_id)
+        if academic_year_id:
+            where.append('t.academic_year_id = %s')
+            params.append(academic_year_id)
+        params.append(required)
+        self.env.cr.execute(f"""
+            SELECT t.candidate_id
+              FROM {Token._table} t
+              JOIN unnest(%s::varchar[], %s::int[]) AS q(token, weight) ON q.token = t.token
+             {('WHERE ' + ' AND '.join(where)) if where else ''}
+             GROUP BY t.candidate_id
+            HAVING sum(q.weight) >= %s
+             ORDER BY t.candidate_id
+             {'LIMIT %s' if limit else ''}
+        """, params + ([limit] if limit else []))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _lookup_fuzzy_shortlist(self, query_name, program_id=None, academic_year_id=None, limit=FUZZY_SHORTLIST_SIZE):
+        """Tier 3 retrieval: the ``limit`` candidates whose normalized full name
+        is most similar to ``query_name`` according to the pg_trgm GIN index.
+        Without pg_trgm, falls back to the first FUZZY_SCAN_LIMIT rows of the
+        scope so callers can still score them in Python."""
+        domain = []
+        if program_id:
+            domain.append(('program_id', '=', program_id))
+        if academic_year_id:
+            domain.append(('academic_year_id', '=', academic_year_id))
+        if not self.env.registry.has_trigram:
+            return self.search(domain, limit=FUZZY_SCAN_LIMIT)
+        if not query_name:
+            return self.browse()
+        self.flush_model(['name_norm_ar', 'program_id', 'academic_year_id'])
+        where = ['name_norm_ar %% %s']
+        params = [query_name]
+        if program_id:
+            where.append('program_id = %s')
+            params.append(program_id)
+        if academic_year_id:
+            where.append('academic_year_id = %s')
+            params.append(academic_year_id)
+        cr = self.env.cr
+        cr.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", [str(FUZZY_SIMILARITY_THRESHOLD)])
+        cr.execute(f"""
+            SELECT id FROM {self._table}
+             WHERE {' AND '.join(where)}
+             ORDER BY similarity(name_norm_ar, %s) DESC, id
+             LIMIT %s
+        """, params + [query_name, limit])
+        return self.browse([row[0] for row in cr.fetchall()])
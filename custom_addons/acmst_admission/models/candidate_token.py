@@ -0,0 +1,18 @@
+from odoo import fields, models, tools
+
+
+class AdmissionsCandidateToken(models.Model):
+    """Inverted index of normalized Arabic name parts, one row per distinct
+    part of a candidate. Maintained by admissions.candidate._sync_name_tokens."""
+    _name = 'admissions.candidate.token'
+    _description = 'Admissions Candidate Name Token'
+    _log_access = False
+
+    token = fields.Char(required=True)
+    candidate_id = fields.Many2one('admissions.candidate', required=True, ondelete='cascade', index=True)
+    program_id = fields.Many2one('admissions.program')
+    academic_year_id = fields.Many2one('admissions.year')
+
+    def init(self):
+        tools.create_index(self._cr, 'admissions_candidate_token_lookup_idx', self._table,
+                           ['token', 'program_id', 'academic_year_id'])
@@ -0,0 +1,76 @@
+"""Per-process pooled HTTP sessions for outbound provider calls, with
+per-provider timeouts, connect retries and latency/failure counters."""
+import threading
+import time
+
+POOL_SIZE = 16
+
+# (connect, read) timeouts in seconds and connect-retry count per provider.
+# Only connection failures are retried: the request never reached the
+# provider, so resending a POST cannot duplicate a message or consume a token.
+PROVIDERS = {
+    'brevo': {'timeout': (3.05, 10), 'connect_retries': 2},
+    'recaptcha': {'timeout': (3.05, 5), 'connect_retries': 2},
+}
+DEFAULT_PROVIDER = {'timeout': (3.05, 10), 'connect_retries': 1}
+
+_lock = threading.Lock()
+_sessions = {}
+_stats = {}
+
+
+def get_session(provider):
+    """Shared keep-alive ``requests.Session`` for ``provider``, created on first use."""
+    session = _sessions.get(provider)
+    if session is None:
+        with _lock:
+            session = _sessions.get(provider)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                retries = PROVIDERS.get(provider, DEFAULT_PROVIDER)['connect_retries']
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_SIZE,
+                    pool_maxsize=POOL_SIZE,
+                    max_retries=Retry(total=retries, connect=retries, read=0, status=0, other=0,
+                                      backoff_factor=0.2, allowed_methods=None),
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sessions[provider] = session
+    return session
+
+
+def post(provider, url, **kwargs):
+    """``Session.post`` through the pooled session of ``provider``, using its
+    default timeouts and recording latency. Any exception or 5xx response counts
+    as a failure."""
+    kwargs.setdefault('timeout', PROVIDERS.get(provider, DEFAULT_PROVIDER)['timeout'])
+    start = time.perf_counter()
+    failed = True
+    try:
+        resp = get_session(provider).post(url, **kwargs)
+        failed = resp.status_code >= 500
+        return resp
+    finally:
+        _record(provider, (time.perf_counter() - start) * 1000.0, failed)
+
+
+def _record(provider, elapsed_ms, failed):
+    with _lock:
+        s = _stats.setdefault(provider, {'requests': 0, 'failures': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        s['requests'] += 1
+        s['failures'] += int(failed)
+        s['total_ms'] += elapsed_ms
+        s['max_ms'] = max(s['max_ms'], elapsed_ms)
+
+
+def stats():
+    """Counters of this process per provider, with the average latency."""
+    with _lock:
+        return {
+            provider: dict(s, avg_ms=round(s['total_ms'] / s['requests'], 1) if s['requests'] else 0.0)
+            for provider, s in _stats.items()
+        }
@@ -0,0 +1,74 @@
+from odoo import api, fields, models
+
+# Attempts per chunk before its rows are rejected. A failed attempt leaves the
+# chunk pending, so it is retried in a new transaction, which sees what the
+# other workers committed meanwhile (e.g. a candidate created for the same key)
+CHUNK_MAX_ATTEMPTS = 3
+
+class AdmissionsImportChunk(models.Model):
+    """Row range [start, stop) of a staged import job, leased by one worker at
+    a time. The chunk row stays locked for the worker's transaction, so a
+    crashed worker simply releases it for the next one."""
+    _name = 'admissions.import.chunk'
+    _description = 'Admissions Import Chunk'
+    _log_access = False
+    _order = 'job_id, start'
+
+    job_id = fields.Many2one('admissions.import.job', required=True, ondelete='cascade', index=True)
+    start = fields.Integer(required=True)
+    stop = fields.Integer(required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], default='pending', required=True, index=True)
+    processed = fields.Integer()
+    imported = fields.Integer()
+    rejected = fields.Integer()
+    attempts = fields.Integer()
+    last_error = fields.Char()
+
+    @api.model
+    def _claim(self, job_ids=None, exclude_ids=None):
+        """Lock and return the next pending chunk of a running job, skipping
+        chunks already leased by other transactions and ``exclude_ids``."""
+        self.flush_model(['state'])
+        query = """
+            SELECT c.id FROM admissions_import_chunk c
+              JOIN admissions_import_job j ON j.id = c.job_id
+             WHERE c.state = 'pending' AND j.state = 'processing'
+        """
+        params = []
+        if job_ids is not None:
+            query += " AND c.job_id = ANY(%s)"
+            params.append(list(job_ids))
+        if exclude_ids:
+            query += " AND c.id != ALL(%s)"
+            params.append(list(exclude_ids))
+        self.env.cr.execute(query + " ORDER BY c.job_id, c.start LIMIT 1 FOR UPDATE OF c SKIP LOCKED", params)
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    @api.model
+    def _has_pending(self):
+        self.env.cr.execute("""
+            SELECT 1 FROM admissions_import_chunk c
+              JOIN admissions_import_job j ON j.id = c.job_id
+             WHERE c.state = 'pending' AND j.state = 'processing'
+             LIMIT 1
+        """)
+        return bool(self.env.cr.fetchone())
+
+    def _record_failure(self, error):
+        """Count a failed attempt; the chunk stays pending until it has used
+        CHUNK_MAX_ATTEMPTS, then all its rows are rejected. Returns whether
+        the chunk was given up."""
+        self.ensure_one()
+        attempts = self.attempts + 1
+        vals = {'attempts': attempts, 'last_error': (error or '')[:255]}
+        given_up = attempts >= CHUNK_MAX_ATTEMPTS
+        if given_up:
+            size = self.stop - self.start
+            vals.update(state='failed', processed=size, imported=0, rejected=size)
+        self.write(vals)
+        return given_up
@@ -0,0 +1,22 @@
+from odoo import fields, models, tools
+
+
+class AdmissionsImportEvent(models.Model):
+    """Append-only log lines and rejected rows of an import job. Batches insert
+    their events once; the job log and errors CSV are built from them on read."""
+    _name = 'admissions.import.event'
+    _description = 'Admissions Import Event'
+    _log_access = False
+    _order = 'id'
+
+    job_id = fields.Many2one('admissions.import.job', required=True, ondelete='cascade')
+    kind = fields.Selection([
+        ('log', 'Log'),
+        ('error', 'Error'),
+    ], required=True, default='log')
+    row = fields.Integer(help='Row number in the source file (header is row 1).')
+    message = fields.Text()
+    at = fields.Datetime(default=lambda self: fields.Datetime.now())
+
+    def init(self):
+        tools.create_index(self._cr, 'admissions_import_event_job_kind_idx', self._table, ['job_id', 'kind'])
@@ -1,8 +1,69 @@
-import base64
 import csv
-from io import StringIO, BytesIO
-from datetime import datetime
+import json
+import logging
+import re
+from collections import defaultdict
+from io import StringIO, BytesIO, TextIOWrapper
+from datetime import date, datetime
+from psycopg2.errors import UniqueViolation
+from psycopg2.extensions import TransactionRollbackError
+
 from odoo import api, fields, models, _
+from .utils import read_xlsx_rows
+
+_logger = logging.getLogger(__name__)
+
+# Row keys kept in the staging table; everything else in the file is dropped
+IMPORT_FIELDS = frozenset((
+    'base_university_id', 'program_code', 'program_name', 'year_code',
+    'first_ar', 'second_ar', 'third_ar', 'fourth_ar',
+    'first_en', 'second_en', 'third_en', 'fourth_en',
+    'national_id', 'dob',
+))
+# Candidate lookup key; never written on update, it is what the row matched on
+IMPORT_KEY_FIELDS = ('base_university_id', 'program_id', 'academic_year_id')
+# Concurrent workers raced on the same candidates: retry the whole chunk in a
+# new transaction rather than rejecting rows
+CONCURRENCY_ERRORS = (TransactionRollbackError, UniqueViolation)
+# Rows per INSERT while staging a file
+STAGE_CHUNK_SIZE = 5000
+# Minimum rows per batch in fast import mode; the COPY path has a high fixed cost per batch
+FAST_IMPORT_BATCH_SIZE = 50000
+
+
+def _program_code(row):
+    """Program code of a staged row, derived from the program name when the
+    file has no code column."""
+    prog_code = (row.get('program_code') or '').strip()
+    if prog_code:
+        return prog_code
+    pname = (row.get('program_name') or '').strip()
+    if pname:
+        ascii_only = re.sub(r"[^A-Za-z0-9]+", "_", pname).strip('_')
+        return ascii_only[:32] or 'GEN'
+    return 'GEN'
+
+
+def _stored_value(value):
+    """Stored candidate value as read(), comparable with import vals."""
+    if isinstance(value, tuple):  # many2one
+        return value[0]
+    if isinstance(value, date):
+        return value.isoformat()
+    return value or False
+
+
+def _to_text(v):
+    if v is None:
+        return ''
+    try:
+        # Avoid scientific notation on integers stored as floats
+        if isinstance(v, float):
+            if v.is_integer():
+                return str(int(v))
+        return str(v)
+    except Exception:
+        return ''
 
 
 class AdmissionsImportJob(models.Model):
@@ -20,13 +81,25 @@ class AdmissionsImportJob(models.Model):
         ('cancelled', 'Cancelled'),
     ], default='pending', index=True)
     total = fields.Integer()
-    processed = fields.Integer()
-    imported = fields.Integer()
-    rejected = fields.Integer()
-    log = fields.Text()
-    errors_csv = fields.Binary(string='Errors CSV')
+    # Summed over the chunks, which are the only records written by concurrent workers
+    processed = fields.Integer(compute='_compute_counters')
+    imported = fields.Integer(compute='_compute_counters')
+    rejected = fields.Integer(compute='_compute_counters')
+    progress = fields.Float(string='Progress (%)', compute='_compute_counters')
+    started_at = fields.Datetime(copy=False, readonly=True)
+    finished_at = fields.Datetime(copy=False, readonly=True)
+    chunk_ids = fields.One2many('admissions.import.chunk', 'job_id', string='Chunks')
+    log = fields.Text(compute='_compute_log')
+    event_ids = fields.One2many('admissions.import.event', 'job_id', string='Events')
     errors_csv_filename = fields.Char(default='import_errors.csv')
     mapping_json = fields.Text(string='Column Mapping (JSON)')
+    fast_import = fields.Boolean(
+        string='Fast Import',
+        help='Load rows with PostgreSQL COPY and a single upsert per batch, bypassing the ORM. '
+             'Needs the unique (base ID, program, year) constraint on candidates; without it rows go through the ORM.')
+    staged = fields.Boolean(copy=False, help='Source rows have been parsed into admissions.import.row.')
+    program_map_json = fields.Text(copy=False, help='Program code -> admissions.program id, resolved when staging.')
+    year_map_json = fields.Text(copy=False, help='Year code -> admissions.year id, resolved when staging.')
 
     # Common header synonyms mapping to expected internal field names
     HEADER_SYNONYMS = {
@@ -44,123 +117,208 @@ class AdmissionsImportJob(models.Model):
         'NATIONAL_ID': 'national_id',
     }
 
-    def append_log(self, msg):
+    def _compute_log(self):
+        Event = self.env['admissions.import.event'].sudo()
+        lines = defaultdict(list)
+        for event in Event.search([('job_id', 'in', self.ids), ('kind', '=', 'log')]):
+            lines[event.job_id.id].append(f"[{event.at}] {event.message}\n")
         for rec in self:
-            rec.log = (rec.log or '') + f"[{fields.Datetime.now()}] {msg}\n"
+            rec.log = ''.join(lines[rec.id])
+
+    def append_log(self, msg):
+        self.env['admissions.import.event'].sudo().create([
+            {'job_id': rec.id, 'kind': 'log', 'message': msg} for rec in self
+        ])
+        self.invalidate_recordset(['log'])
+
+    def _log_errors(self, errors):
+        """Record rejected rows given as (row number, reason) pairs."""
+        self.ensure_one()
+        self.env['admissions.import.event'].sudo().create([
+            {'job_id': self.id, 'kind': 'error', 'row': row, 'message': reason} for row, reason in errors
+        ])
+
+    def _errors_csv(self):
+        """Rejected rows of the job as CSV bytes, built from its error events."""
+        self.ensure_one()
+        self.env['admissions.import.event'].flush_model()
+        self.env.cr.execute("""
+            SELECT row, message FROM admissions_import_event
+             WHERE job_id = %s AND kind = 'error'
+             ORDER BY row, id
+        """, [self.id])
+        out = StringIO()
+        writer = csv.writer(out)
+        writer.writerow(['row', 'reason'])
+        writer.writerows(self.env.cr.fetchall())
+        return out.getvalue().encode('utf-8')
+
+    def action_download_errors(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'target': 'self',
+            'url': f'/admissions/import/{self.id}/errors.csv',
+        }
+
+    @api.depends('chunk_ids.processed', 'chunk_ids.imported', 'chunk_ids.rejected')
+    def _compute_counters(self):
+        totals = {
+            job.id: (processed, imported, rejected)
+            for job, processed, imported, rejected in self.env['admissions.import.chunk']._read_group(
+                [('job_id', 'in', self.ids)], ['job_id'], ['processed:sum', 'imported:sum', 'rejected:sum'])
+        }
+        for job in self:
+            job.processed, job.imported, job.rejected = totals.get(job.id, (0, 0, 0))
+            job.progress = round(100.0 * job.processed / job.total, 1) if job.total else 0.0
+
+    def get_progress(self):
+        """Progress snapshot for polling: counters, percentage, throughput and
+        estimated seconds left while the job is running."""
+        self.ensure_one()
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = ((self.finished_at or fields.Datetime.now()) - self.started_at).total_seconds()
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.state == 'processing' and rate:
+            eta = round(max(self.total - self.processed, 0) / rate)
+        return {
+            'id': self.id,
+            'state': self.state,
+            'total': self.total,
+            'processed': self.processed,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'percent': self.progress,
+            'rows_per_sec': round(rate, 1),
+            'eta_seconds': eta,
+        }
 
     @api.model
     def cron_process_import_jobs(self, limit=1, batch_size=1000):
-        jobs = self.search([('state', 'in', ('pending', 'processing'))], order='id', limit=limit)
-        for job in jobs:
-            try:
-                job._process_job(batch_size=batch_size)
-            except Exception as e:
-                job.write({'state': 'error'})
-                job.append_log(f"Error: {e}")
+        """Start pending jobs, then process up to ``limit`` chunks of any running
+        job. Several crons may run this concurrently: chunks are leased with
+        FOR UPDATE SKIP LOCKED and each one is committed on its own."""
+        cr = self.env.cr
+        while True:
+            job = self._lock_job_to_start()
+            if not job:
+                break
+            job._start_job_safe(batch_size)
+            cr.commit()
+        Chunk = self.env['admissions.import.chunk'].sudo()
+        for _i in range(limit):
+            chunk = Chunk._claim()
+            if not chunk:
+                break
+            chunk.job_id._process_chunk_safe(chunk)
+            cr.commit()
+        self._finalize_jobs()
+        if Chunk._has_pending():
+            self._trigger_workers()
+
+    @api.model
+    def _lock_job_to_start(self):
+        self.env.cr.execute("""
+            SELECT id FROM admissions_import_job
+             WHERE state = 'pending' OR (state = 'processing' AND NOT COALESCE(staged, FALSE))
+             ORDER BY id LIMIT 1
+               FOR UPDATE SKIP LOCKED
+        """)
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    @api.model
+    def _trigger_workers(self):
+        for xmlid in ('acmst_admission.ir_cron_admissions_import', 'acmst_admission.ir_cron_admissions_import_worker_2'):
+            cron = self.env.ref(xmlid, raise_if_not_found=False)
+            if cron and cron.active:
+                cron.sudo()._trigger()
+
+    def _start_job_safe(self, batch_size):
+        try:
+            with self.env.cr.savepoint():
+                self._start_job(batch_size)
+        except Exception as e:
+            self._set_error(f"Error: {e}")
 
-    def _process_job(self, batch_size=1000):
+    def _process_chunk_safe(self, chunk):
+        """Process ``chunk`` in a savepoint. A failure only affects the chunk:
+        it is retried later, and the job and its staged rows are kept for the
+        other workers."""
+        try:
+            with self.env.cr.savepoint():
+                self._process_chunk(chunk)
+        except Exception as e:
+            rows = f"rows {chunk.start + 2}-{chunk.stop + 1}"
+            if chunk._record_failure(str(e)):
+                reason = f"chunk failed {chunk.attempts} times: {e}"
+                self._log_errors([(idx + 2, reason) for idx in range(chunk.start, chunk.stop)])
+                self.append_log(f"Rejected {rows} after {chunk.attempts} attempts: {e}")
+            else:
+                self.append_log(f"Attempt {chunk.attempts} on {rows} failed, will retry: {e}")
+
+    def _set_error(self, msg):
+        self.write({'state': 'error', 'finished_at': fields.Datetime.now()})
+        self._drop_staged_rows()
+        self.append_log(msg)
+
+    def _start_job(self, batch_size=1000):
+        """Stage the source rows and split them into chunks of ``batch_size`` rows."""
         self.ensure_one()
-        if not self.data:
+        if not self._source_attachment():
             self.write({'state': 'error'})
             self.append_log('No data in job.')
             return
-        if self.state == 'cancelled':
-            return
-        if self.state == 'pending':
-            self.write({'state': 'processing', 'processed': 0, 'imported': 0, 'rejected': 0})
-
-        # Decode to rows
-        data = base64.b64decode(self.data)
-        name = (self.filename or '').lower()
-        if name.endswith('.xlsx'):
-            rows = self._read_xlsx_rows(data)
-        else:
-            rows = self._read_csv_rows(data)
-        # Apply optional column mapping
-        rows = self._apply_mapping(rows)
-        # Apply header synonyms if still not mapped
-        rows = self._apply_synonyms(rows)
-        self.total = len(rows)
+        self.chunk_ids.sudo().unlink()
+        self.write({'state': 'processing', 'started_at': fields.Datetime.now(), 'finished_at': False})
+        self._stage_rows()
+        if self.fast_import:
+            batch_size = max(batch_size, FAST_IMPORT_BATCH_SIZE)
+        self.env['admissions.import.chunk'].sudo().create([
+            {'job_id': self.id, 'start': start, 'stop': min(start + batch_size, self.total)}
+            for start in range(0, self.total, batch_size)
+        ])
+        self.append_log(f"Started: {self.total} rows in {len(self.chunk_ids)} chunks")
 
+    def _process_chunk(self, chunk):
+        """Import the staged rows of ``chunk``. Only the chunk is written, so
+        chunks of one job can be processed by concurrent workers."""
+        self.ensure_one()
         Candidate = self.env['admissions.candidate'].sudo()
-        Program = self.env['admissions.program'].sudo()
-        Year = self.env['admissions.year'].sudo()
-        prog_cache = {}
-        year_cache = {}
-        from .utils import normalize_arabic, to_western_digits
-
-        error_out = StringIO()
-        error_writer = csv.writer(error_out)
-        error_writer.writerow(['row', 'reason'])
+        program_map = json.loads(self.program_map_json or '{}')
+        year_map = json.loads(self.year_map_json or '{}')
+        from .utils import normalize_arabic_many, to_western_digits
 
-        start = self.processed
-        end = min(start + batch_size, self.total)
+        errors = []  # (row number, reason)
+        imported = 0
+        rows = self._read_staged_rows(chunk.start, chunk.stop)
 
-        def _to_text(v):
-            if v is None:
-                return ''
-            try:
-                # Avoid scientific notation on integers stored as floats
-                if isinstance(v, float):
-                    if v.is_integer():
-                        return str(int(v))
-                return str(v)
-            except Exception:
-                return ''
-        batch_vals = []
-        for idx in range(start, end):
-            if self.state == 'cancelled':
-                break
-            row = rows[idx]
+        # (base_university_id, program_id, academic_year_id) -> (vals, source row indexes)
+        pending = {}
+        for idx in range(chunk.start, chunk.stop):
+            row = rows.get(idx) or {}
             try:
                 base_id = _to_text(row.get('base_university_id')).strip()
-                prog_code = _to_text(row.get('program_code')).strip()
                 year_code = _to_text(row.get('year_code')).strip()
                 # Keep academic year as provided (e.g., '2023/2022') for code/label
                 # Optionally normalize if purely numeric float
                 if not (base_id and year_code):
-                    self.rejected += 1
-                    error_writer.writerow([idx + 2, 'missing base/year'])
+                    errors.append((idx + 2, 'missing base/year'))
                     continue
-                # Fallback program code if missing
-                if not prog_code:
-                    pname = (row.get('program_name') or '').strip()
-                    if pname:
-                        import re as _re
-                        ascii_only = _re.sub(r"[^A-Za-z0-9]+", "_", pname).strip('_')
-                        prog_code = ascii_only[:32] or 'GEN'
-                    else:
-                        prog_code = 'GEN'
-                prog = None
-                if prog_code in prog_cache:
-                    prog = prog_cache[prog_code]
-                else:
-                    prog = Program.search([('code', '=', prog_code)], limit=1)
-                pname = _to_text(row.get('program_name')).strip()
-                if not prog:
-                    vals_prog = {'code': prog_code}
-                    if pname:
-                        vals_prog['name_ar'] = pname
-                    prog = Program.create(vals_prog)
-                else:
-                    if pname and not prog.name_ar:
-                        prog.write({'name_ar': pname})
-                prog_cache[prog_code] = prog
-                if year_code in year_cache:
-                    year = year_cache[year_code]
-                else:
-                    year = Year.search([('code', '=', year_code)], limit=1)
-                if not year:
-                    year = Year.create({'code': year_code, 'label': year_code})
-                year_cache[year_code] = year
+                prog_id = program_map[_program_code(row)]
+                year_id = year_map[year_code]
+                first_ar, second_ar, third_ar, fourth_ar = normalize_arabic_many(
+                    _to_text(row.get(f)) for f in ('first_ar', 'second_ar', 'third_ar', 'fourth_ar'))
                 vals = {
                     'base_university_id': to_western_digits(base_id),
-                    'program_id': prog.id,
-                    'academic_year_id': year.id,
-                    'first_ar': normalize_arabic(_to_text(row.get('first_ar'))),
-                    'second_ar': normalize_arabic(_to_text(row.get('second_ar'))),
-                    'third_ar': normalize_arabic(_to_text(row.get('third_ar'))),
-                    'fourth_ar': normalize_arabic(_to_text(row.get('fourth_ar'))),
+                    'program_id': prog_id,
+                    'academic_year_id': year_id,
+                    'first_ar': first_ar,
+                    'second_ar': second_ar,
+                    'third_ar': third_ar,
+                    'fourth_ar': fourth_ar,
                     'first_en': _to_text(row.get('first_en')).strip(),
                     'second_en': _to_text(row.get('second_en')).strip(),
                     'third_en': _to_text(row.get('third_en')).strip(),
@@ -177,100 +335,299 @@ class AdmissionsImportJob(models.Model):
                             vals['dob'] = f"{y}-{int(m):02d}-{int(d):02d}"
                     except Exception:
                         pass
-                dup = Candidate.search([
-                    ('base_university_id', '=', vals['base_university_id']),
-                    ('program_id', '=', prog.id),
-                    ('academic_year_id', '=', year.id),
-                ], limit=1)
-                if dup:
-                    vals['import_job_id'] = self.id
-                    dup.write(vals)
+                vals['import_job_id'] = self.id
+                key = (vals['base_university_id'], prog_id, year_id)
+                if key in pending:
+                    # Repeated key within the batch: later rows win, as with sequential writes
+                    pending[key][0].update(vals)
+                    pending[key][1].append(idx)
                 else:
-                    vals['import_job_id'] = self.id
-                    batch_vals.append(vals)
-                self.imported += 1
+                    pending[key] = (vals, [idx])
+                imported += 1
             except Exception as e:
-                self.rejected += 1
-                error_writer.writerow([idx + 2, str(e)])
-            self.processed += 1
+                errors.append((idx + 2, str(e)))
+
+        if self.fast_import and Candidate._has_import_key_constraint():
+            upsert_errors = self._import_by_halves(Candidate._import_upsert, list(pending.values()))
+            imported -= len(upsert_errors)
+            errors.extend(upsert_errors)
+            pending = {}
+        elif self.fast_import:
+            _logger.warning("Import job %s: candidate import key constraint missing "
+                            "(duplicate keys in the database?), using the ORM path", self.id)
+
+        # Resolve existing candidates of the whole batch at once
+        existing = Candidate._get_ids_by_import_key(list(pending))
+        to_create = []  # (vals, row indexes)
+        to_update = []  # (candidate id, vals, row indexes)
+        for key, (vals, idxs) in pending.items():
+            if key in existing:
+                to_update.append((existing[key], vals, idxs))
+            else:
+                to_create.append((vals, idxs))
+        for vals, targets in self._group_changes(Candidate, to_update).items():
+            try:
+                with self.env.cr.savepoint():
+                    Candidate.browse([cid for cid, _idxs in targets]).write(dict(vals))
+            except CONCURRENCY_ERRORS:
+                raise
+            except Exception:
+                # Per-row fallback, only for the group that failed
+                for cid, idxs in targets:
+                    try:
+                        with self.env.cr.savepoint():
+                            Candidate.browse(cid).write(dict(vals))
+                    except CONCURRENCY_ERRORS:
+                        raise
+                    except Exception as e:
+                        for idx in idxs:
+                            imported -= 1
+                            errors.append((idx + 2, str(e)))
+
+        # Bulk create for performance. Another worker may create the same key
+        # meanwhile: the unique violation fails this attempt of the chunk, and
+        # the retry, in a new transaction, finds the candidate and updates it
+        create_errors = self._import_by_halves(Candidate.create, to_create)
+        imported -= len(create_errors)
+        errors.extend(create_errors)
+
+        if errors:
+            self._log_errors(errors)
+        # Counters are written once per chunk, never per row
+        chunk.write({
+            'state': 'done',
+            'processed': chunk.stop - chunk.start,
+            'imported': imported,
+            'rejected': len(errors),
+        })
+
+    def _import_by_halves(self, write, items):
+        """Pass the vals of (vals, row indexes) pairs to ``write`` (the bulk
+        create or the fast-path upsert) in one call. A failing batch is split
+        in halves and retried, down to single rows, so one bad row only
+        rejects itself. Returns the (row number, reason) errors."""
+        if not items:
+            return []
+        try:
+            with self.env.cr.savepoint():
+                write([vals for vals, _idxs in items])
+            return []
+        except CONCURRENCY_ERRORS:
+            raise
+        except Exception as e:
+            if len(items) == 1:
+                return [(idx + 2, str(e)) for idx in items[0][1]]
+        mid = len(items) // 2
+        return self._import_by_halves(write, items[:mid]) + self._import_by_halves(write, items[mid:])
+
+    @api.model
+    def _group_changes(self, Candidate, to_update):
+        """Diff (candidate id, vals, row indexes) triples against the stored
+        values and group the candidates by their changed (field, value) set,
+        key fields excluded, so each distinct change is one write().
+        Unchanged candidates are left out."""
+        groups = defaultdict(list)
+        if not to_update:
+            return groups
+        fnames = sorted({f for _cid, vals, _idxs in to_update for f in vals} - set(IMPORT_KEY_FIELDS))
+        current = {r['id']: r for r in Candidate.browse([cid for cid, _vals, _idxs in to_update]).read(fnames)}
+        for cid, vals, idxs in to_update:
+            cur = current[cid]
+            diff = tuple(sorted(
+                (f, v) for f, v in vals.items()
+                if f not in IMPORT_KEY_FIELDS and _stored_value(cur[f]) != (v or False)
+            ))
+            if diff:
+                groups[diff].append((cid, idxs))
+        return groups
 
-        # Bulk create for performance
-        if batch_vals:
-            Candidate.create(batch_vals)
+    @api.model
+    def _finalize_jobs(self, job_ids=None):
+        """Mark running jobs without pending chunks as done."""
+        self.env['admissions.import.chunk'].flush_model(['state'])
+        self.flush_model(['state', 'staged'])
+        query = """
+            SELECT j.id FROM admissions_import_job j
+             WHERE j.state = 'processing' AND j.staged
+               AND NOT EXISTS (SELECT 1 FROM admissions_import_chunk c
+                                WHERE c.job_id = j.id AND c.state = 'pending')
+        """
+        params = []
+        if job_ids is not None:
+            query += " AND j.id = ANY(%s)"
+            params.append(list(job_ids))
+        self.env.cr.execute(query + " FOR UPDATE OF j SKIP LOCKED", params)
+        for job in self.browse([r[0] for r in self.env.cr.fetchall()]):
+            job.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+            job._drop_staged_rows()
+            job.append_log(f"Completed: imported={job.imported}, rejected={job.rejected}")
 
-        # Save errors CSV so far
-        self.errors_csv = base64.b64encode(error_out.getvalue().encode('utf-8'))
+    def _stage_rows(self):
+        """Parse the source file once into admissions.import.row, applying the
+        column mapping and header synonyms, and set ``total``."""
+        self.ensure_one()
+        self._drop_staged_rows()
+        with self._open_source() as source:
+            self._stage_source(source)
 
-        if self.processed >= self.total:
-            self.state = 'done'
-            self.append_log(f"Completed: imported={self.imported}, rejected={self.rejected}")
+    def _stage_source(self, source):
+        name = (self.filename or '').lower()
+        if name.endswith('.xlsx'):
+            header, rows = self._read_xlsx_rows(source)
         else:
-            self.append_log(f"Progress: {self.processed}/{self.total}")
+            header, rows = self._read_csv_rows(source)
+        columns = [(f, i) for f, i in self._column_index(header, self.mapping_json).items() if f in IMPORT_FIELDS]
+        total = 0
+        chunk = []
+        program_names = {}  # code -> first non-empty program name
+        year_codes = set()
+        for values in rows:
+            row = {f: _to_text(values[i]) for f, i in columns if i < len(values) and values[i] is not None}
+            chunk.append(json.dumps(row))
+            year_code = row.get('year_code', '').strip()
+            if row.get('base_university_id', '').strip() and year_code:
+                year_codes.add(year_code)
+                prog_code = _program_code(row)
+                if not program_names.get(prog_code):
+                    program_names[prog_code] = row.get('program_name', '').strip()
+            if len(chunk) >= STAGE_CHUNK_SIZE:
+                self._insert_staged_rows(total, chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            self._insert_staged_rows(total, chunk)
+            total += len(chunk)
+        self.write({
+            'staged': True,
+            'total': total,
+            'program_map_json': json.dumps(self._resolve_programs(program_names)),
+            'year_map_json': json.dumps(self._resolve_years(year_codes)),
+        })
+
+    @api.model
+    def _resolve_programs(self, program_names):
+        """Ids of the programs for ``{code: name}``, creating missing ones in bulk
+        and filling in the Arabic name where it is still empty."""
+        Program = self.env['admissions.program'].sudo()
+        programs = Program.search([('code', 'in', list(program_names))])
+        by_code = {p.code: p for p in programs}
+        for prog in programs:
+            pname = program_names[prog.code]
+            if pname and not prog.name_ar:
+                prog.name_ar = pname
+        missing = [code for code in program_names if code not in by_code]
+        if missing:
+            vals_list = []
+            for code in missing:
+                vals_prog = {'code': code}
+                if program_names[code]:
+                    vals_prog['name_ar'] = program_names[code]
+                vals_list.append(vals_prog)
+            created = Program.create(vals_list)
+            by_code.update(zip(missing, created))
+        return {code: prog.id for code, prog in by_code.items()}
+
+    @api.model
+    def _resolve_years(self, year_codes):
+        """Ids of the academic years for ``year_codes``, creating missing ones in bulk."""
+        Year = self.env['admissions.year'].sudo()
+        by_code = {y.code: y.id for y in Year.search([('code', 'in', list(year_codes))])}
+        missing = [code for code in year_codes if code not in by_code]
+        if missing:
+            by_code.update(zip(missing, Year.create([{'code': code, 'label': code} for code in missing]).ids))
+        return by_code
+
+    def _insert_staged_rows(self, offset, payloads):
+        self.env.cr.execute("""
+            INSERT INTO admissions_import_row (job_id, sequence, data)
+            SELECT %s, %s + r.ord - 1, r.data::jsonb
+              FROM unnest(%s::text[]) WITH ORDINALITY AS r(data, ord)
+        """, [self.id, offset, payloads])
+
+    def _read_staged_rows(self, start, end):
+        """Staged rows with ``start <= sequence < end`` as {sequence: row}."""
+        self.env.cr.execute("""
+            SELECT sequence, data FROM admissions_import_row
+             WHERE job_id = %s AND sequence >= %s AND sequence < %s
+        """, [self.id, start, end])
+        return dict(self.env.cr.fetchall())
+
+    def _drop_staged_rows(self):
+        if not self.ids:
+            return
+        self.env.cr.execute("DELETE FROM admissions_import_row WHERE job_id IN %s", [tuple(self.ids)])
+        self.env['admissions.import.row'].invalidate_model()
 
     def action_cancel(self):
-        self.write({'state': 'cancelled'})
+        self.write({'state': 'cancelled', 'finished_at': fields.Datetime.now()})
+        self._drop_staged_rows()
         self.append_log('Cancelled by user.')
 
     def action_process_now(self):
+        Chunk = self.env['admissions.import.chunk'].sudo()
         for job in self:
             try:
-                # Process in large batches until done or cancelled
-                while job.state in ('pending', 'processing'):
-                    job._process_job(batch_size=10000)
-                    if job.state in ('done', 'error', 'cancelled'):
+                if job.state == 'pending' or (job.state == 'processing' and not job.staged):
+                    job._start_job(batch_size=10000)
+                # Process the chunks not leased by a cron worker, then finish if none is left.
+                # A chunk that fails here is left to the crons, which retry it in a new transaction
+                seen = []
+                while job.state == 'processing':
+                    chunk = Chunk._claim(job.ids, exclude_ids=seen)
+                    if not chunk:
                         break
+                    seen.append(chunk.id)
+                    job._process_chunk_safe(chunk)
+                self._finalize_jobs(job.ids)
+                if Chunk._has_pending():
+                    self._trigger_workers()
             except Exception as e:
-                job.write({'state': 'error'})
-                job.append_log(f"Error on manual process: {e}")
+                job._set_error(f"Error on manual process: {e}")
+
+    def _source_attachment(self):
+        self.ensure_one()
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name), ('res_field', '=', 'data'), ('res_id', '=', self.id),
+        ], limit=1)
 
-    def _read_csv_rows(self, data):
-        text = data.decode('utf-8-sig', errors='ignore')
-        f = StringIO(text)
-        reader = csv.DictReader(f)
-        return list(reader)
+    def _open_source(self):
+        """Binary file object on the source file, opened straight from the
+        filestore when the attachment lives there (no base64 round-trip)."""
+        attachment = self._source_attachment()
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return BytesIO(attachment.raw or b'')
 
-    def _read_xlsx_rows(self, data):
+    def _read_csv_rows(self, source):
+        """Header index and lazy row lists of a CSV file object."""
+        reader = csv.reader(TextIOWrapper(source, encoding='utf-8-sig', errors='ignore', newline=''))
+        titles = next(reader, [])
+        return {title: i for i, title in enumerate(titles)}, reader
+
+    def _read_xlsx_rows(self, source):
+        """Header index and lazy row tuples of an XLSX file object."""
         try:
-            import openpyxl
-        except Exception:
+            return read_xlsx_rows(source)
+        except ImportError:
             # fallback by returning no rows
-            return []
-        wb = openpyxl.load_workbook(filename=BytesIO(data), read_only=True)
-        ws = wb.active
-        headers = [str(c.value) if c.value is not None else '' for c in next(ws.rows)]
-        rows = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            rows.append({headers[j]: (row[j] if j is not None and j < len(row) else None) for j in range(len(headers))})
-        return rows
-
-    def _apply_synonyms(self, rows):
-        if not rows:
-            return rows
-        out = []
-        for r in rows:
-            new_r = dict(r)
-            for key, val in list(r.items()):
-                k_upper = str(key or '').strip().upper()
-                dst = self.HEADER_SYNONYMS.get(k_upper)
-                if dst and dst not in new_r:
-                    new_r[dst] = val
-            out.append(new_r)
-        return out
-
-    def _apply_mapping(self, rows):
-        if not self.mapping_json:
-            return rows
+            return {}, iter(())
+
+    @api.model
+    def _column_index(self, header, mapping_json=None):
+        """Column position per field name: the file header, then the optional
+        column mapping, then header synonyms for fields still not mapped.
+        Also used by the import wizard preview, so both resolve alike."""
+        index = dict(header)
         try:
-            import json
-            mapping = json.loads(self.mapping_json)
             # mapping: inputName -> expectedField
-            out = []
-            for r in rows:
-                new_r = dict(r)
-                for src, dst in mapping.items():
-                    if src in r:
-                        new_r[dst] = r.get(src)
-                out.append(new_r)
-            return out
+            mapping = dict(json.loads(mapping_json)) if mapping_json else {}
         except Exception:
-            return rows
+            mapping = {}
+        for src, dst in mapping.items():
+            if src in index:
+                index[dst] = index[src]
+        for title, i in list(index.items()):
+            dst = self.HEADER_SYNONYMS.get(str(title or '').strip().upper())
+            if dst and dst not in index:
+                index[dst] = i
+        return index
@@ -0,0 +1,18 @@
+from odoo import fields, models
+
+
+class AdmissionsImportRow(models.Model):
+    """Parsed rows of an import job, written once when the job starts so that
+    each batch reads only its own row range instead of re-parsing the file."""
+    _name = 'admissions.import.row'
+    _description = 'Admissions Import Staged Row'
+    _log_access = False
+    _order = 'job_id, sequence'
+
+    job_id = fields.Many2one('admissions.import.job', required=True, ondelete='cascade')
+    sequence = fields.Integer(required=True, help='0-based position of the row in the source file.')
+    data = fields.Json()
+
+    _sql_constraints = [
+        ('job_sequence_uniq', 'unique(job_id, sequence)', 'Row already staged for this job.'),
+    ]
@@ -1,4 +1,4 @@
-from odoo import models, fields
+from odoo import models, fields, tools
 
 
 class AdmissionsOtp(models.Model):
@@ -14,6 +14,7 @@ class AdmissionsOtp(models.Model):
     status = fields.Selection([
         ('new', 'New'),
         ('sent', 'Sent'),
+        ('failed', 'Send Failed'),
         ('ok', 'Verified'),
         ('bad', 'Failed'),
         ('exp', 'Expired'),
@@ -21,3 +22,8 @@ class AdmissionsOtp(models.Model):
     ip = fields.Char()
     user_agent = fields.Char()
 
+    def init(self):
+        # Daily cap / cooldown lookups filter on phone + purpose over recent rows
+        tools.create_index(self._cr, 'admissions_otp_phone_purpose_create_date_idx', self._table,
+                           ['phone', 'purpose', 'create_date'])
+        tools.create_index(self._cr, 'admissions_otp_create_date_idx', self._table, ['create_date'])
@@ -1,4 +1,4 @@
-from odoo import fields, models
+from odoo import fields, models, tools
 
 
 class AdmissionsOtpLog(models.Model):
@@ -13,3 +13,7 @@ class AdmissionsOtpLog(models.Model):
     payload = fields.Json(string='Payload')
     message = fields.Char()
 
+    def init(self):
+        tools.create_index(self._cr, 'admissions_otp_log_phone_create_date_idx', self._table,
+                           ['phone', 'create_date'])
+        tools.create_index(self._cr, 'admissions_otp_log_create_date_idx', self._table, ['create_date'])
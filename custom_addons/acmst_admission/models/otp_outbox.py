@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from odoo import api, fields, models, tools
+from . import http_client
+
+_logger = logging.getLogger(__name__)
+
+BREVO_SEND_URL = 'https://api.brevo.com/v3/whatsapp/sendTemplate'
+
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_WORKERS = 8
+OUTBOX_MAX_ATTEMPTS = 5
+# Retry n waits OUTBOX_RETRY_BASE_SECONDS * 2**(n-1), capped
+OUTBOX_RETRY_BASE_SECONDS = 15
+OUTBOX_RETRY_MAX_SECONDS = 600
+
+
+def _outbox_cipher():
+    """Fernet cipher for queued OTP codes. The key comes from the server
+    configuration file (``acmst_otp_outbox_key``, else the master password), never
+    from the database, so a dump or replica of the outbox alone cannot reveal codes."""
+    secret = tools.config.get('acmst_otp_outbox_key') or tools.config.get('admin_passwd') or ''
+    digest = hashlib.sha256(f'acmst_admission.otp_outbox:{secret}'.encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+def _post(request_args):
+    """Send one prepared request; runs in a drain thread, no ORM access."""
+    try:
+        resp = http_client.post('brevo', **request_args)
+    except Exception as e:
+        return False, str(e)
+    if resp.status_code >= 300:
+        return False, f'Brevo error {resp.status_code}: {resp.text}'
+    return True, ''
+
+
+class AdmissionsOtpOutbox(models.Model):
+    _name = 'admissions.otp.outbox'
+    _description = 'Admissions OTP Outbound Message'
+    _order = 'id'
+
+    otp_id = fields.Many2one('admissions.otp', string='OTP', required=True, ondelete='cascade', index=True)
+    phone = fields.Char(required=True)
+    name_param = fields.Char(string='Name Parameter')
+    code = fields.Char(groups='base.group_system',
+                       help='OTP code encrypted with a server-side key, cleared once the message is sent, '
+                            'given up or the OTP has expired. Verification only uses the OTP hash.')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ], default='pending', required=True, index=True)
+    attempts = fields.Integer(default=0)
+    next_attempt_at = fields.Datetime(default=lambda self: fields.Datetime.now(), index=True)
+    last_error = fields.Char()
+
+    @api.model
+    def enqueue(self, otp, code, name_param=''):
+        """Queue the WhatsApp message for ``otp`` and wake the drain cron."""
+        msg = self.sudo().create({
+            'otp_id': otp.id,
+            'phone': otp.phone,
+            'name_param': name_param or '',
+            'code': _outbox_cipher().encrypt(code.encode()).decode(),
+        })
+        self.env.ref('acmst_admission.ir_cron_admissions_otp_outbox').sudo()._trigger()
+        return msg
+
+    @api.model
+    def _brevo_request(self, phone_e164, otp_code, name_param=''):
+        """Keyword arguments for ``Session.post`` of a Brevo WhatsApp template send.
+        Configure acmst_admission.brevo_api_key, brevo_sender, brevo_template,
+        brevo_language, and optionally brevo_api_url (e.g. a local stub server)."""
+        config = self.env['admissions.settings'].get_config()
+        if not (config.brevo_api_key and config.brevo_sender):
+            raise Exception('Brevo API not configured')
+        return {
+            'url': config.brevo_api_url or BREVO_SEND_URL,
+            'headers': {
+                'accept': 'application/json',
+                'api-key': config.brevo_api_key,
+                'content-type': 'application/json',
+            },
+            'json': {
+                'senderNumber': config.brevo_sender,  # WhatsApp sender number (international format)
+                'contactNumber': phone_e164,
+                'templateName': config.brevo_template or 'otp',
+                # Match your template variables: {{name}} and {{otp}}
+                'params': {'name': name_param or '', 'otp': otp_code},
+                'language': config.brevo_language or 'ar',
+            },
+        }
+
+    @api.model
+    def _send_now(self, phone_e164, otp_code, name_param=''):
+        """Synchronous send, raising on failure."""
+        ok, error = _post(self._brevo_request(phone_e164, otp_code, name_param))
+        if not ok:
+            raise Exception(error)
+
+    @api.model
+    def cron_drain_outbox(self, batch_size=OUTBOX_BATCH_SIZE, max_workers=OUTBOX_MAX_WORKERS):
+        messages = self.search([
+            ('state', '=', 'pending'), ('next_attempt_at', '<=', fields.Datetime.now()),
+        ], limit=batch_size)
+        if not messages:
+            return
+        cipher = _outbox_cipher()
+        now = fields.Datetime.now()
+        prepared, results = [], {}
+        for msg in messages:
+            if msg.otp_id.expire_at and msg.otp_id.expire_at <= now:
+                msg._give_up('OTP expired before it could be sent')
+                continue
+            try:
+                code = cipher.decrypt(msg.code.encode()).decode()
+            except (InvalidToken, AttributeError):
+                msg._give_up('Queued OTP code could not be decrypted')
+                continue
+            try:
+                prepared.append((msg, msg._brevo_request(msg.phone, code, msg.name_param)))
+            except Exception as e:
+                results[msg] = (False, str(e))
+        # Only the HTTP round-trips run in threads; results are written back here
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prepared) or 1))) as pool:
+            for (msg, _args), result in zip(prepared, pool.map(_post, [args for _msg, args in prepared])):
+                results[msg] = result
+        for msg, (ok, error) in results.items():
+            msg._record_attempt(ok, error)
+        remaining = self.search_count([('state', '=', 'pending'), ('next_attempt_at', '<=', fields.Datetime.now())])
+        if remaining:
+            self.env.ref('acmst_admission.ir_cron_admissions_otp_outbox').sudo()._trigger()
+
+    def _record_attempt(self, ok, error=''):
+        self.ensure_one()
+        attempts = self.attempts + 1
+        OtpLog = self.env['admissions.otp.log'].sudo()
+        if ok:
+            self.write({'state': 'sent', 'attempts': attempts, 'code': False, 'last_error': False})
+            self.otp_id.write({'status': 'sent'})
+            OtpLog.create({'provider': 'brevo', 'phone': self.phone, 'event': 'send', 'status': 'sent'})
+            return
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            self.write({'attempts': attempts})
+            self._give_up(error, log=False)
+            status = 'failed'
+        else:
+            delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+            self.write({
+                'attempts': attempts,
+                'last_error': error,
+                'next_attempt_at': fields.Datetime.now() + timedelta(seconds=delay),
+            })
+            status = 'retry'
+        _logger.warning("Brevo OTP send to %s failed (attempt %s): %s", self.phone, attempts, error)
+        OtpLog.create({'provider': 'brevo', 'phone': self.phone, 'event': 'send', 'status': status,
+                       'message': (error or '')[:255]})
+
+    def _give_up(self, error, log=True):
+        """Mark the message failed and scrub its code in the same transaction."""
+        self.ensure_one()
+        self.write({'state': 'failed', 'code': False, 'last_error': error})
+        self.otp_id.write({'status': 'failed'})
+        if log:
+            _logger.warning("Brevo OTP send to %s abandoned: %s", self.phone, error)
+            self.env['admissions.otp.log'].sudo().create({
+                'provider': 'brevo', 'phone': self.phone, 'event': 'send', 'status': 'failed',
+                'message': (error or '')[:255],
+            })
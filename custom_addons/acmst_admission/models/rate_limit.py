@@ -1,5 +1,96 @@
+import threading
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
+
+
+DEFAULT_RATE_LIMIT_BACKEND = 'bucket'
+
+
+class OrmRateLimitBackend:
+    """One admissions.rate.limit row per hit, counted with search_count."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def hit(self, route, ip):
+        self.model.create({'route': route, 'ip': ip})
+
+    def count(self, route, ip, window_minutes):
+        since = fields.Datetime.to_string(datetime.utcnow() - timedelta(minutes=window_minutes))
+        return self.model.search_count([
+            ('route', '=', route), ('ip', '=', ip), ('created_at', '>=', since)
+        ])
+
+
+class BucketRateLimitBackend:
+    """Per-minute hit counters in an UNLOGGED table, one upserted row per
+    (route, ip, minute). Shared by all workers of the database."""
+    table = 'admissions_rate_limit_bucket'
+
+    def __init__(self, model):
+        self.cr = model.env.cr
+        self.registry = model.env.registry
+
+    def hit(self, route, ip):
+        # Concurrent requests from one IP update the same row. The upsert runs
+        # in its own READ COMMITTED transaction, committed at once, so the row
+        # lock is not held for the rest of the request and a concurrent update
+        # never raises a serialization failure in the request's cursor
+        with self.registry.cursor() as cr:
+            cr.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            cr.execute(f"""
+                INSERT INTO {self.table} (route, ip, bucket, hits)
+                VALUES (%s, %s, date_trunc('minute', now() at time zone 'UTC'), 1)
+                ON CONFLICT (route, ip, bucket) DO UPDATE SET hits = {self.table}.hits + 1
+            """, [route, ip])
+
+    def count(self, route, ip, window_minutes):
+        self.cr.execute(f"""
+            SELECT COALESCE(sum(hits), 0) FROM {self.table}
+             WHERE route = %s AND ip = %s
+               AND bucket > now() at time zone 'UTC' - make_interval(mins => %s)
+        """, [route, ip, int(window_minutes)])
+        return self.cr.fetchone()[0]
+
+
+class MemoryRateLimitBackend:
+    """Sliding window of per-minute counters held in process memory. Never
+    touches the database, but every worker process counts on its own, so it is
+    only accurate for single-process (threaded) deployments."""
+    max_window_minutes = 24 * 60
+    max_keys = 100000
+    _lock = threading.Lock()
+    _windows = {}  # (dbname, route, ip) -> deque of [minute, hits]
+
+    def __init__(self, model):
+        self.dbname = model.env.cr.dbname
+
+    def hit(self, route, ip):
+        minute = int(time.time() // 60)
+        with self._lock:
+            if len(self._windows) >= self.max_keys:
+                self._sweep(minute)
+            window = self._windows.setdefault((self.dbname, route, ip), deque())
+            if window and window[-1][0] == minute:
+                window[-1][1] += 1
+            else:
+                window.append([minute, 1])
+            while window[0][0] <= minute - self.max_window_minutes:
+                window.popleft()
+
+    def count(self, route, ip, window_minutes):
+        since = int(time.time() // 60) - int(window_minutes)
+        with self._lock:
+            window = self._windows.get((self.dbname, route, ip))
+            return sum(hits for minute, hits in window if minute > since) if window else 0
+
+    @classmethod
+    def _sweep(cls, minute):
+        for key, window in list(cls._windows.items()):
+            if window[-1][0] <= minute - cls.max_window_minutes:
+                del cls._windows[key]
 
 
 class AdmissionsRateLimit(models.Model):
@@ -11,15 +102,53 @@ class AdmissionsRateLimit(models.Model):
     ip = fields.Char(required=True, index=True)
     created_at = fields.Datetime(default=lambda self: fields.Datetime.now(), index=True)
 
+    def init(self):
+        tools.create_index(self._cr, 'admissions_rate_limit_route_ip_created_at_idx', self._table,
+                           ['route', 'ip', 'created_at'])
+        self.env.cr.execute(f"""
+            CREATE UNLOGGED TABLE IF NOT EXISTS {BucketRateLimitBackend.table} (
+                route varchar NOT NULL,
+                ip varchar NOT NULL,
+                bucket timestamp NOT NULL,
+                hits integer NOT NULL DEFAULT 0,
+                PRIMARY KEY (route, ip, bucket)
+            )
+        """)
+
+    @api.model
+    def _purge_buckets(self, cutoff, batch_size):
+        """Delete bucket counters older than ``cutoff``, ``batch_size`` rows per statement."""
+        cr = self.env.cr
+        table = BucketRateLimitBackend.table
+        while True:
+            cr.execute(f"""
+                DELETE FROM {table} WHERE ctid IN (
+                    SELECT ctid FROM {table} WHERE bucket < %s LIMIT %s
+                )
+            """, [cutoff, batch_size])
+            if cr.rowcount < batch_size:
+                break
+            cr.commit()
+
+    @api.model
+    def _rate_limit_backends(self):
+        """Available limiter backends by key; extend to plug in another one."""
+        return {
+            'bucket': BucketRateLimitBackend,
+            'memory': MemoryRateLimitBackend,
+            'orm': OrmRateLimitBackend,
+        }
+
+    @api.model
+    def _get_backend(self):
+        key = self.env['admissions.settings'].get_config().rate_limit_backend or DEFAULT_RATE_LIMIT_BACKEND
+        backends = self._rate_limit_backends()
+        return backends.get(key, backends[DEFAULT_RATE_LIMIT_BACKEND])(self.sudo())
+
     @api.model
     def hit(self, route: str, ip: str):
-        self.create({'route': route, 'ip': ip})
+        self._get_backend().hit(route, ip)
 
     @api.model
     def is_limited(self, route: str, ip: str, window_minutes: int, max_hits: int) -> bool:
-        since = fields.Datetime.to_string(datetime.utcnow() - timedelta(minutes=window_minutes))
-        count = self.search_count([
-            ('route', '=', route), ('ip', '=', ip), ('created_at', '>=', since)
-        ])
-        return count >= max_hits
-
+        return self._get_backend().count(route, ip, window_minutes) >= max_hits
@@ -8,6 +8,9 @@ class ResConfigSettings(models.TransientModel):
     brevo_sender = fields.Char(string='Brevo WhatsApp Sender', config_parameter='acmst_admission.brevo_sender')
     brevo_template = fields.Char(string='Brevo Template Name', default='otp', config_parameter='acmst_admission.brevo_template')
     brevo_language = fields.Char(string='Brevo Template Language', default='en', config_parameter='acmst_admission.brevo_language')
+    brevo_api_url = fields.Char(string='Brevo Send URL',
+                                help='Override of the Brevo WhatsApp template endpoint, e.g. a local stub server for testing.',
+                                config_parameter='acmst_admission.brevo_api_url')
 
     recaptcha_site_key = fields.Char(string='reCAPTCHA Site Key', config_parameter='acmst_admission.recaptcha_site_key')
     recaptcha_secret_key = fields.Char(string='reCAPTCHA Secret Key', config_parameter='acmst_admission.recaptcha_secret_key')
@@ -16,6 +19,14 @@ class ResConfigSettings(models.TransientModel):
                                    help='Comma- or line-separated E.164 phone numbers to block OTP sending.',
                                    config_parameter='acmst_admission.blacklist_phones')
 
+    rate_limit_backend = fields.Selection([
+        ('bucket', 'Database (per-minute counters)'),
+        ('memory', 'Worker memory (single process only)'),
+        ('orm', 'Database (one row per request)'),
+    ], string='Rate Limit Backend', default='bucket',
+        help='Where request counters for lookup/OTP rate limits are kept.',
+        config_parameter='acmst_admission.rate_limit_backend')
+
     brevo_webhook_secret = fields.Char(string='Brevo Webhook Secret',
                                        help='Shared secret used to validate Brevo webhook callbacks.',
                                        config_parameter='acmst_admission.brevo_webhook_secret')
@@ -1,4 +1,39 @@
-from odoo import api, fields, models
+import logging
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+# admissions.settings fields copied into the cached config snapshot
+CONFIG_SETTINGS_FIELDS = (
+    'otp_length', 'otp_ttl_minutes', 'otp_cooldown_seconds', 'verify_attempts_per_code',
+    'rate_limit_window_minutes', 'rate_limit_sends_per_window', 'rate_limit_daily_sends',
+    'recaptcha_grace_seconds',
+)
+# ir.config_parameter keys copied into the cached config snapshot
+CONFIG_PARAMS = {
+    'recaptcha_site_key': 'acmst_admission.recaptcha_site_key',
+    'recaptcha_secret_key': 'acmst_admission.recaptcha_secret_key',
+    'brevo_api_key': 'acmst_admission.brevo_api_key',
+    'brevo_sender': 'acmst_admission.brevo_sender',
+    'brevo_template': 'acmst_admission.brevo_template',
+    'brevo_language': 'acmst_admission.brevo_language',
+    'brevo_api_url': 'acmst_admission.brevo_api_url',
+    'brevo_webhook_secret': 'acmst_admission.brevo_webhook_secret',
+    'rate_limit_backend': 'acmst_admission.rate_limit_backend',
+}
+AdmissionsConfig = namedtuple('AdmissionsConfig', CONFIG_SETTINGS_FIELDS + tuple(CONFIG_PARAMS) + (
+    'blacklist_phones',))
+
+# Upper bound of delete batches per model and cron run; the cron is
+# re-triggered while expired rows remain
+PURGE_MAX_BATCHES = 20
+RETENTION_FIELDS = (
+    'retention_rate_limit_days', 'retention_otp_days', 'retention_otp_log_days', 'retention_batch_size',
+)
 
 
 class AdmissionsSettings(models.Model):
@@ -13,7 +48,99 @@ class AdmissionsSettings(models.Model):
     verify_attempts_per_code = fields.Integer(default=5)
     id_comp_rule = fields.Char(string='ID Composition Rule', default='{{ base }}{{ year }}')
     otp_cooldown_seconds = fields.Integer(string='OTP Cooldown (sec)', default=60)
+    recaptcha_grace_seconds = fields.Integer(
+        string='reCAPTCHA Grace Period (sec)', default=300,
+        help='After a passed challenge, later steps in the same session skip verification for this long. 0 disables.')
+
+    # Retention (days, 0 keeps rows forever)
+    retention_rate_limit_days = fields.Integer(string='Rate Limit Retention (days)', default=2)
+    retention_otp_days = fields.Integer(string='OTP Retention (days)', default=30,
+                                        help='Kept for at least one day, the daily send cap looks back 24 hours.')
+    retention_otp_log_days = fields.Integer(string='OTP Log Retention (days)', default=90)
+    retention_batch_size = fields.Integer(string='Purge Batch Size', default=5000)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
 
     @api.model
     def get_settings(self):
         return self.sudo().search([], limit=1, order='id desc')
+
+    @api.model
+    def get_config(self):
+        """Read-only snapshot of the current settings record and the admissions
+        config parameters, cached per worker. Dropped on any write to
+        admissions.settings, and on ir.config_parameter writes, which clear the
+        registry cache themselves."""
+        return self._get_config_snapshot()
+
+    @tools.ormcache()
+    def _get_config_snapshot(self):
+        settings = self.get_settings()
+        ICP = self.env['ir.config_parameter'].sudo()
+        values = {f: settings[f] if settings else 0 for f in CONFIG_SETTINGS_FIELDS}
+        values.update({key: ICP.get_param(param) or '' for key, param in CONFIG_PARAMS.items()})
+        raw_blacklist = ICP.get_param('acmst_admission.blacklist_phones') or ''
+        values['blacklist_phones'] = frozenset(p.strip() for p in re.split(r'[\s,;]+', raw_blacklist) if p.strip())
+        return AdmissionsConfig(**values)
+
+    @api.model
+    def cron_purge_expired_records(self):
+        # Without a settings record, purge with the default retention values
+        settings = self.get_settings() or self.new(self.default_get(list(RETENTION_FIELDS)))
+        batch_size = settings.retention_batch_size or 5000
+        RateLimit = self.env['admissions.rate.limit'].sudo()
+        remaining = False
+        if settings.retention_rate_limit_days > 0:
+            cutoff = fields.Datetime.now() - timedelta(days=settings.retention_rate_limit_days)
+            remaining |= self._purge_older_than(RateLimit, 'created_at', cutoff, batch_size)
+            RateLimit._purge_buckets(cutoff, batch_size)
+        if settings.retention_otp_days > 0:
+            cutoff = fields.Datetime.now() - timedelta(days=max(settings.retention_otp_days, 1))
+            remaining |= self._purge_older_than(self.env['admissions.otp'].sudo(), 'create_date', cutoff, batch_size)
+        if settings.retention_otp_log_days > 0:
+            cutoff = fields.Datetime.now() - timedelta(days=settings.retention_otp_log_days)
+            remaining |= self._purge_older_than(self.env['admissions.otp.log'].sudo(), 'create_date', cutoff, batch_size)
+        if remaining:
+            # Catch up on the backlog in another run instead of waiting a day
+            cron = self.env.ref('acmst_admission.ir_cron_admissions_purge', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+
+    @api.model
+    def _purge_older_than(self, Model, date_field, cutoff, batch_size):
+        """Unlink records of ``Model`` older than ``cutoff`` in batches of
+        ``batch_size``, committing after each batch. Returns whether expired
+        records remain after PURGE_MAX_BATCHES batches."""
+        total = 0
+        remaining = False
+        for _batch in range(PURGE_MAX_BATCHES):
+            records = Model.search([(date_field, '<', cutoff)], order='id', limit=batch_size)
+            if not records:
+                break
+            records.unlink()
+            self.env.cr.commit()
+            total += len(records)
+            if len(records) < batch_size:
+                break
+        else:
+            remaining = bool(Model.search_count([(date_field, '<', cutoff)], limit=1))
+        if total:
+            _logger.info("Admissions purge: removed %s %s rows older than %s", total, Model._name, cutoff)
+        if remaining:
+            _logger.info("Admissions purge: batch cap reached for %s, rows older than %s remain; re-triggering",
+                         Model._name, cutoff)
+        return remaining
@@ -1,5 +1,6 @@
 import re
 import unicodedata
+from functools import lru_cache
 
 
 ARABIC_DIACRITICS = (
@@ -13,26 +14,58 @@ ARABIC_DIACRITICS = (
 )
 TATWEEL = '\u0640'
 
-_diacritics_re = re.compile('|'.join(ARABIC_DIACRITICS))
-_spaces_re = re.compile(r"\s+")
+# Single-pass character mapping: drop tatweel and diacritics, fold alef/ya/ta marbuta variants
+_ARABIC_TRANSLATION = str.maketrans({
+    **dict.fromkeys(ARABIC_DIACRITICS),
+    TATWEEL: None,
+    '\u0622': '\u0627', '\u0623': '\u0627', '\u0625': '\u0627',  # آأإ -> ا
+    '\u0649': '\u064A',  # ى -> ي
+    '\u0629': '\u0647',  # ة -> ه (heuristic)
+})
+NORMALIZE_CACHE_SIZE = 65536
+
+
+def _normalize_arabic(text: str) -> str:
+    # NFKC is the identity on ASCII
+    t = text if text.isascii() else unicodedata.normalize('NFKC', text)
+    # Collapse spaces after the character mapping
+    return ' '.join(t.translate(_ARABIC_TRANSLATION).split())
+
+
+_normalize_arabic_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_normalize_arabic)
 
 
 def normalize_arabic(text: str) -> str:
     if not text:
         return text
-    # Normalize Unicode form
-    t = unicodedata.normalize('NFKC', text)
-    # Remove tatweel
-    t = t.replace(TATWEEL, '')
-    # Remove diacritics
-    t = _diacritics_re.sub('', t)
-    # Normalize alef/ya/hamza variants
-    t = t.replace('\u0622', '\u0627').replace('\u0623', '\u0627').replace('\u0625', '\u0627')  # آأإ -> ا
-    t = t.replace('\u0649', '\u064A')  # ى -> ي
-    t = t.replace('\u0629', '\u0647')  # ة -> ه (heuristic)
-    # Collapse spaces
-    t = _spaces_re.sub(' ', t).strip()
-    return t
+    return _normalize_arabic_cached(text)
+
+
+def normalize_arabic_many(texts):
+    """Batch form of normalize_arabic returning a list. Repeated values in the
+    batch are normalized once; the shared LRU cache is left untouched so bulk
+    imports do not evict the values hot on the website."""
+    seen = {}
+    out = []
+    for text in texts:
+        if not text:
+            out.append(text)
+            continue
+        norm = seen.get(text)
+        if norm is None:
+            norm = seen[text] = _normalize_arabic(text)
+        out.append(norm)
+    return out
+
+
+def normalize_name_key(text: str) -> str:
+    """Comparison key for a name part: normalized Arabic, lower-cased, never None."""
+    return (normalize_arabic(text or '') or '').lower()
+
+
+def normalize_name_keys(texts):
+    """Batch form of normalize_name_key."""
+    return [(t or '').lower() for t in normalize_arabic_many(texts)]
 
 
 def to_western_digits(text: str) -> str:
@@ -67,3 +100,29 @@ def try_format_e164(phone: str, default_region: str = 'SA') -> str:
                 p = '+966' + p[1:]
         return p if re.match(r'^\+[1-9]\d{7,14}$', p) else ''
 
+
+
+def read_xlsx_rows(fileobj):
+    """Header index and lazy rows of the active sheet of an XLSX file.
+
+    Returns ``(header, rows)`` where ``header`` maps each column title to its
+    position (the last one wins on duplicates, as with csv.DictReader) and
+    ``rows`` yields one tuple per data row, padded to the header width. The
+    workbook is opened read-only and closed when ``rows`` is exhausted or
+    closed, so memory does not grow with the sheet size."""
+    import openpyxl
+    wb = openpyxl.load_workbook(filename=fileobj, read_only=True, data_only=True)
+    sheet_rows = wb.active.iter_rows(values_only=True)
+    titles = [str(v) if v is not None else '' for v in next(sheet_rows, ())]
+    header = {title: i for i, title in enumerate(titles)}
+    return header, _iter_padded_rows(wb, sheet_rows, len(titles))
+
+
+def _iter_padded_rows(wb, rows, width):
+    try:
+        for row in rows:
+            if len(row) < width:
+                row += (None,) * (width - len(row))
+            yield row
+    finally:
+        wb.close()
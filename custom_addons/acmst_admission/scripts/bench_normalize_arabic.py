@@ -0,0 +1,97 @@
+"""Micro-benchmark for models/utils.normalize_arabic.
+
+Runs without Odoo:
+
+    python3 custom_addons/acmst_admission/scripts/bench_normalize_arabic.py [N]
+
+Builds a synthetic corpus of N (default 100000) Arabic name parts with
+diacritics, tatweel and hamza variants, checks the new implementation against
+the previous regex-based one, and prints timings for:
+  - legacy: the previous NFKC + regex + str.replace chain, one call per value
+  - single (cold): normalize_arabic on an empty LRU cache
+  - single (warm): normalize_arabic again, served from the LRU cache
+  - batch: normalize_arabic_many over the whole corpus
+"""
+import importlib.util
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+_UTILS = os.path.join(os.path.dirname(__file__), '..', 'models', 'utils.py')
+_spec = importlib.util.spec_from_file_location('acmst_admission_utils', _UTILS)
+utils = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(utils)
+
+_diacritics_re = re.compile('|'.join(utils.ARABIC_DIACRITICS))
+_spaces_re = re.compile(r"\s+")
+
+
+def legacy_normalize_arabic(text):
+    if not text:
+        return text
+    t = unicodedata.normalize('NFKC', text)
+    t = t.replace(utils.TATWEEL, '')
+    t = _diacritics_re.sub('', t)
+    t = t.replace('آ', 'ا').replace('أ', 'ا').replace('إ', 'ا')
+    t = t.replace('ى', 'ي')
+    t = t.replace('ة', 'ه')
+    t = _spaces_re.sub(' ', t).strip()
+    return t
+
+
+NAMES = [
+    'محمد', 'أحمد', 'إبراهيم', 'آمنة', 'فاطمة', 'عبد الله', 'مصطفى', 'يحيى', 'عيسى',
+    'خديجة', 'عائشة', 'حسن', 'حسين', 'علي', 'عمر', 'عثمان', 'الطيب', 'بشير', 'إسماعيل',
+    'مريم', 'سلمى', 'هبة', 'رقية', 'أسامة', 'ياسر', 'موسى', 'الزبير', 'الصادق', 'نور الهدى',
+]
+DIACRITICS = ['َ', 'ُ', 'ِ', 'ّ', 'ْ', 'ً']
+
+
+def build_corpus(n, seed=17):
+    rnd = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        name = rnd.choice(NAMES)
+        chars = []
+        for ch in name:
+            chars.append(ch)
+            if rnd.random() < 0.3:
+                chars.append(rnd.choice(DIACRITICS))
+            if rnd.random() < 0.05:
+                chars.append(utils.TATWEEL)
+        value = ''.join(chars)
+        if rnd.random() < 0.2:
+            value = '  ' + value.replace(' ', '   ') + ' '
+        corpus.append(value)
+    return corpus
+
+
+def timed(label, fn, n):
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<16} {dt * 1000:9.1f} ms  {n / dt:12,.0f} values/s")
+    return dt
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    corpus = build_corpus(n)
+    expected = [legacy_normalize_arabic(v) for v in corpus]
+    assert [utils.normalize_arabic(v) for v in corpus] == expected
+    assert utils.normalize_arabic_many(corpus) == expected
+    utils._normalize_arabic_cached.cache_clear()
+
+    print(f"corpus: {n} values, {len(set(corpus))} distinct")
+    base = timed('legacy', lambda: [legacy_normalize_arabic(v) for v in corpus], n)
+    cold = timed('single (cold)', lambda: [utils.normalize_arabic(v) for v in corpus], n)
+    warm = timed('single (warm)', lambda: [utils.normalize_arabic(v) for v in corpus], n)
+    batch = timed('batch', lambda: utils.normalize_arabic_many(corpus), n)
+    print(f"speedup vs legacy: cold x{base / cold:.1f}, warm x{base / warm:.1f}, batch x{base / batch:.1f}")
+
+
+if __name__ == '__main__':
+    main()
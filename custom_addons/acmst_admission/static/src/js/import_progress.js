@@ -0,0 +1,56 @@
+/** @odoo-module **/
+/** Progress bar for admissions.import.job that polls /admissions/import/<id>/progress while the job runs. */
+import { Component, onWillStart, onWillUnmount, useState } from "@odoo/owl";
+import { browser } from "@web/core/browser/browser";
+import { registry } from "@web/core/registry";
+import { standardFieldProps } from "@web/views/fields/standard_field_props";
+
+const POLL_INTERVAL_MS = 3000;
+const RUNNING_STATES = ["pending", "processing"];
+
+export class ImportProgressField extends Component {
+    static template = "acmst_admission.ImportProgressField";
+    static props = { ...standardFieldProps };
+
+    setup() {
+        this.state = useState({ progress: null });
+        this.timer = null;
+        onWillStart(() => this.poll());
+        onWillUnmount(() => browser.clearTimeout(this.timer));
+    }
+
+    async poll() {
+        const resId = this.props.record.resId;
+        if (!resId) {
+            return;
+        }
+        try {
+            const response = await browser.fetch(`/admissions/import/${resId}/progress`);
+            if (response.ok) {
+                this.state.progress = await response.json();
+            }
+        } catch {
+            // Keep the last snapshot; the next poll may succeed
+        }
+        const progress = this.state.progress;
+        if (!progress || RUNNING_STATES.includes(progress.state)) {
+            this.timer = browser.setTimeout(() => this.poll(), POLL_INTERVAL_MS);
+        }
+    }
+
+    get etaLabel() {
+        const eta = this.state.progress && this.state.progress.eta_seconds;
+        if (eta === null || eta === undefined) {
+            return "";
+        }
+        const minutes = Math.floor(eta / 60);
+        return minutes ? `${minutes}m ${eta % 60}s` : `${eta}s`;
+    }
+}
+
+export const importProgressField = {
+    component: ImportProgressField,
+    supportedTypes: ["float"],
+};
+
+registry.category("fields").add("import_progress", importProgressField);
@@ -1,9 +1,14 @@
-import base64
 import csv
-from io import StringIO, BytesIO
+import random
+import re
+from collections import Counter
+from datetime import date
+from itertools import islice
+from io import BytesIO, TextIOWrapper
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
-from ..models.utils import normalize_arabic, to_western_digits
+from ..models.import_job import IMPORT_FIELDS
+from ..models.utils import normalize_arabic, read_xlsx_rows, to_western_digits
 
 
 EXPECTED_HEADERS = [
@@ -11,19 +16,42 @@ EXPECTED_HEADERS = [
     'first_en', 'second_en', 'third_en', 'fourth_en',
     'program_code', 'year_code', 'base_university_id', 'dob', 'national_id',
 ]
-HEADER_SYNONYMS = {
-    'FRMNO': 'base_university_id',
-    'FRM': 'base_university_id',
-    'UNIV_ID': 'program_code',
-    'FAC': 'program_code',
-    'FACNAME': 'program_name',
-    'YEAR': 'year_code',
-    'N1': 'first_ar',
-    'N2': 'second_ar',
-    'N3': 'third_ar',
-    'N4': 'fourth_ar',
-    'NATIONAL_ID': 'national_id',
-}
+
+# Preview: rows shown, rows scanned at most, and random sample size for column profiles
+PREVIEW_ROWS = 10
+PREVIEW_SCAN_ROWS = 5000
+PREVIEW_SAMPLE_SIZE = 200
+
+_INTEGER_RE = re.compile(r'[+-]?\d+')
+_NUMBER_RE = re.compile(r'[+-]?\d*\.\d+')
+_DATE_RE = re.compile(r'\d{4}-\d{1,2}-\d{1,2}(?:[ T].*)?|\d{1,2}/\d{1,2}/\d{4}')
+
+
+def _sniff_type(value):
+    """Coarse type of a cell value for the preview, None when empty."""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return 'date'
+    if isinstance(value, (int, float)):
+        return 'integer' if float(value).is_integer() else 'number'
+    text = to_western_digits(str(value).strip())
+    if not text:
+        return None
+    if _INTEGER_RE.fullmatch(text):
+        return 'integer'
+    if _NUMBER_RE.fullmatch(text):
+        return 'number'
+    if _DATE_RE.fullmatch(text):
+        return 'date'
+    return 'text'
+
+
+def _closing(rows, stream):
+    try:
+        yield from rows
+    finally:
+        stream.close()
 
 
 class AdmissionsImportWizard(models.TransientModel):
@@ -37,19 +65,54 @@ class AdmissionsImportWizard(models.TransientModel):
     rejected_count = fields.Integer(readonly=True)
     mapping_json = fields.Text(string='Column Mapping (JSON)',
                                help='Optional JSON mapping of input column names to expected fields, e.g. {"BaseID":"base_university_id"}.')
+    fast_import = fields.Boolean(string='Fast Import',
+                                 help='For very large files: load rows with PostgreSQL COPY and one upsert per batch instead of the ORM.')
 
     def action_preview(self):
+        """Preview the first rows and a per-column profile (inferred field, fill
+        rate, sniffed type) taken from a random sample of the first
+        PREVIEW_SCAN_ROWS rows. Only that part of the file is read."""
         self.ensure_one()
-        rows = self._read_rows(limit=10)
-        out = []
-        out.append(','.join(EXPECTED_HEADERS) + '  # synonyms accepted: ' + ', '.join([f"{k}->{v}" for k,v in HEADER_SYNONYMS.items()]))
-        for r in rows:
-            # apply synonyms for preview
-            r2 = dict(r)
-            for k, v in HEADER_SYNONYMS.items():
-                if k in r and v not in r2:
-                    r2[v] = r.get(k)
-            out.append(','.join([str(r2.get(h, '')) for h in EXPECTED_HEADERS]))
+        header, rows = self._read_rows()
+        head, sample, scanned = [], [], 0
+        rng = random.Random()
+        try:
+            for n, row in enumerate(islice(rows, PREVIEW_SCAN_ROWS)):
+                scanned = n + 1
+                if n < PREVIEW_ROWS:
+                    head.append(row)
+                # Reservoir sampling keeps a uniform sample of the scanned rows
+                if len(sample) < PREVIEW_SAMPLE_SIZE:
+                    sample.append(row)
+                else:
+                    j = rng.randrange(n + 1)
+                    if j < PREVIEW_SAMPLE_SIZE:
+                        sample[j] = row
+        finally:
+            rows.close()
+        fields_by_column = self._infer_columns(header)
+        out = [_('Columns (sample of %s out of the first %s rows):') % (len(sample), scanned)]
+        for title, j in header.items():
+            values = [row[j] for row in sample if j < len(row)]
+            types = Counter(t for t in map(_sniff_type, values) if t)
+            filled = sum(types.values())
+            out.append('  %s -> %s | fill %s%% | %s' % (
+                title or '?',
+                fields_by_column.get(title) or _('(ignored)'),
+                round(100.0 * filled / len(sample)) if sample else 0,
+                types.most_common(1)[0][0] if types else '-',
+            ))
+        missing = [f for f in EXPECTED_HEADERS if f not in fields_by_column.values()]
+        if missing:
+            out.append(_('Missing fields: %s') % ', '.join(missing))
+        out.append('')
+        out.append(','.join(EXPECTED_HEADERS) + '  # synonyms accepted: ' + ', '.join([f"{k}->{v}" for k,v in self.env['admissions.import.job'].HEADER_SYNONYMS.items()]))
+        index = {field: header[title] for title, field in fields_by_column.items()}
+        for row in head:
+            out.append(','.join([
+                str(row[index[h]]) if h in index and index[h] < len(row) and row[index[h]] is not None else ''
+                for h in EXPECTED_HEADERS
+            ]))
         self.preview = '\n'.join(out)
         return {
             'type': 'ir.actions.act_window',
@@ -62,14 +125,20 @@ class AdmissionsImportWizard(models.TransientModel):
     def action_import(self):
         self.ensure_one()
         # Enqueue as background job processed by cron
-        if not self.upload:
+        upload = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name), ('res_field', '=', 'upload'), ('res_id', '=', self.id),
+        ], limit=1)
+        if not upload:
             return
         job = self.env['admissions.import.job'].sudo().create({
             'filename': self.filename or 'import.csv',
-            'data': self.upload,
             'state': 'pending',
             'mapping_json': self.mapping_json,
+            'fast_import': self.fast_import,
         })
+        # The copy points at the same filestore file; the content is not re-encoded
+        upload.copy({'res_model': job._name, 'res_field': 'data', 'res_id': job.id, 'name': 'data'})
+        job._trigger_workers()
         self.preview = _('Import enqueued as job #%s. Check Admissions > Import Jobs for progress.') % job.id
         self.imported_count = 0
         self.rejected_count = 0
@@ -89,41 +158,43 @@ class AdmissionsImportWizard(models.TransientModel):
         }
 
     # Helpers
-    def _read_rows(self, limit=None):
-        if not self.upload:
+    def _infer_columns(self, header):
+        """Target field per file column title, resolved by the import job's own
+        column index so the preview shows what the import will do."""
+        index = self.env['admissions.import.job']._column_index(header, self.mapping_json)
+        by_position = {}
+        for field, i in index.items():
+            if field in IMPORT_FIELDS:
+                by_position.setdefault(i, field)
+        return {title: by_position[i] for title, i in header.items() if i in by_position}
+
+    def _open_upload(self):
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name), ('res_field', '=', 'upload'), ('res_id', '=', self.id),
+        ], limit=1)
+        if not attachment:
             raise UserError(_('No file uploaded'))
-        data = base64.b64decode(self.upload)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return BytesIO(attachment.raw or b'')
+
+    def _read_rows(self):
+        """Header index and lazy rows of the upload; nothing is read ahead."""
         name = (self.filename or '').lower()
         if name.endswith('.csv') or not name:
-            return self._read_csv(data, limit=limit)
+            stream = TextIOWrapper(self._open_upload(), encoding='utf-8-sig', newline='')
+            reader = csv.reader(stream)
+            titles = next(reader, [])
+            return {title: i for i, title in enumerate(titles)}, _closing(reader, stream)
         elif name.endswith('.xlsx'):
+            stream = self._open_upload()
             try:
-                return self._read_xlsx(data, limit=limit)
+                header, rows = read_xlsx_rows(stream)
             except Exception as e:
+                stream.close()
+                if isinstance(e, UserError):
+                    raise
                 raise UserError(_('Failed to read XLSX. Install openpyxl or upload CSV.\nError: %s') % e)
+            return header, _closing(rows, stream)
         else:
             raise UserError(_('Unsupported file type. Please upload CSV or XLSX.'))
-
-    def _read_csv(self, data, limit=None):
-        text = data.decode('utf-8-sig')
-        f = StringIO(text)
-        reader = csv.DictReader(f)
-        rows = []
-        for i, row in enumerate(reader):
-            rows.append(row)
-            if limit and len(rows) >= limit:
-                break
-        return rows
-
-    def _read_xlsx(self, data, limit=None):
-        import openpyxl  # noqa: F401
-        wb = openpyxl.load_workbook(filename=BytesIO(data), read_only=True)
-        ws = wb.active
-        headers = [c.value for c in next(ws.rows)]
-        rows = []
-        for i, row in enumerate(ws.iter_rows(min_row=2, values_only=True)):
-            rec = {headers[j]: (row[j] if j < len(row) else None) for j in range(len(headers))}
-            rows.append(rec)
-            if limit and len(rows) >= limit:
-                break
-        return rows
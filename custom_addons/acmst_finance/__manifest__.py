@@ -9,10 +9,12 @@
     "depends": ["base", "contacts", "mail", "portal", "account"],
     "data": [
         "security/ir.model.access.csv",
+        "data/cron.xml",
         "wizards/student_import_views.xml",
         "views/student_views.xml",
         "views/res_partner_views.xml",
         "views/menu.xml",
+        "views/student_import_log_views.xml",
         "views/account_move_inherit.xml",
         "views/res_company_signature_views.xml",
         "report/student_invoice_report.xml",
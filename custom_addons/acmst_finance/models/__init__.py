@@ -1,4 +1,5 @@
 from . import student
+from . import student_import_log
 from . import enrollment
 from . import account_move_ext
 from . import account_move_inherit
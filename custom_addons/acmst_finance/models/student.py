@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError
 
+# Student fields whose change must be mirrored on the related partner
+PARTNER_SOURCE_FIELDS = frozenset(("n1", "n2", "n3", "n4", "frmno", "year", "partner_id"))
+# Partner fields kept in sync with the student after the partner exists
+PARTNER_MIRRORED_FIELDS = ("name", "university_id", "student_year")
+
 
 class AcmstStudent(models.Model):
     _name = "acmst.student"
@@ -95,6 +100,12 @@ class AcmstStudent(models.Model):
             )
 
     # ------------ Partner helpers ------------
+    @tools.ormcache()
+    def _partner_optional_fields(self):
+        """Student-related res.partner fields that exist in this registry (checked once)."""
+        Partner = self.env["res.partner"]
+        return tuple(f for f in ("is_student", "university_id", "student_year") if f in Partner._fields)
+
     def _ensure_partner_vals(self):
         """Build safe vals for res.partner (only set fields that really exist)."""
         self.ensure_one()
@@ -103,24 +114,42 @@ class AcmstStudent(models.Model):
             "company_type": "person",
             "customer_rank": 1,
         }
-        Partner = self.env["res.partner"]
-        if "is_student" in Partner._fields:
+        optional = self._partner_optional_fields()
+        if "is_student" in optional:
             vals["is_student"] = True
-        if "university_id" in Partner._fields:
+        if "university_id" in optional:
             vals["university_id"] = self.frmno or False
-        if "student_year" in Partner._fields:
+        if "student_year" in optional:
             vals["student_year"] = self.year or False
         return vals
 
-    def action_create_partner(self):
-        for rec in self:
+    def _sync_partners(self):
+        """
+        Batch partner sync: create all missing partners with one create, and
+        write only partners whose mirrored fields (name, university_id,
+        student_year) differ, grouped by identical changes.
+        """
+        Partner = self.env["res.partner"]
+        missing = self.filtered(lambda r: not r.partner_id)
+        if missing:
+            partners = Partner.create([rec._ensure_partner_vals() for rec in missing])
+            for rec, partner in zip(missing.with_context(acmst_skip_partner_sync=True), partners):
+                rec.partner_id = partner.id
+        mirrored = [f for f in PARTNER_MIRRORED_FIELDS if f == "name" or f in self._partner_optional_fields()]
+        changes = {}
+        for rec in self - missing:
             vals = rec._ensure_partner_vals()
-            if rec.partner_id:
-                rec.partner_id.write(vals)
-            else:
-                rec.partner_id = self.env["res.partner"].create(vals).id
+            partner = rec.partner_id
+            diff = tuple((f, vals[f]) for f in mirrored if (partner[f] or False) != (vals[f] or False))
+            if diff:
+                changes.setdefault(diff, []).append(partner.id)
+        for diff, partner_ids in changes.items():
+            Partner.browse(partner_ids).write(dict(diff))
         return True
 
+    def action_create_partner(self):
+        return self._sync_partners()
+
     # ------------ Invoicing actions (buttons) ------------
     def action_view_invoices(self):
         self.ensure_one()
@@ -196,8 +225,12 @@ class AcmstStudent(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
+        if not self.env.context.get("acmst_skip_partner_sync"):
+            records._sync_partners()
+        # Bulk ingestion records one acmst.student.import.log per run instead
+        if self.env.context.get("acmst_ingestion"):
+            return records
         for rec in records:
-            rec.action_create_partner()
             rec.message_post(
                 body=_("Student record created by %s.") % rec.env.user.display_name
             )
@@ -205,9 +238,8 @@ class AcmstStudent(models.Model):
 
     def write(self, vals):
         res = super().write(vals)
-        for rec in self:
-            if rec.partner_id:
-                rec.partner_id.write(rec._ensure_partner_vals())
+        if not self.env.context.get("acmst_skip_partner_sync") and PARTNER_SOURCE_FIELDS.intersection(vals):
+            self.filtered("partner_id")._sync_partners()
         return res
 
     # ------------ Portal (optional) ------------
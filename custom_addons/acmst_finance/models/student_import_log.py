@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from io import BytesIO
+
+import openpyxl
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+from .student_import_parse import COLMAP, FIELDS, FRMNO_POS, RowConverter, parse_rows, to_text
+
+_logger = logging.getLogger(__name__)
+
+BATCH_CREATE = 1000
+BATCH_UPDATE = 1000
+# Existing students whose current values are read per query when diffing updates
+DIFF_READ_BATCH = 5000
+COMMIT_EVERY = 1000
+# Runs of one import before it is failed; each run resumes the write stage
+JOB_MAX_ATTEMPTS = 3
+
+
+class _JobRequeued(Exception):
+    """The running import lost its lock and was requeued meanwhile."""
+
+
+class AcmstStudentImportLog(models.Model):
+    """
+    One record per Excel import run. The run itself is processed here, in its
+    own cursor, in the background by a cron or right away from the wizard:
+    sheet rows are parsed (see student_import_parse), then written through the
+    ORM. Bulk ingestion skips the per-student chatter messages; this record
+    lists what the run did instead.
+
+    A running import keeps its record locked, and commits its counters every
+    COMMIT_EVERY writes. A run killed by the worker time limit releases the
+    lock; the next cron run requeues the job and the rerun resumes the write
+    stage, skipping the students already written. The sheet is parsed again
+    on every run, so parsing a file must fit in limit_time_real_cron.
+    """
+    _name = "acmst.student.import.log"
+    _description = "ACMST Student Import Log"
+    _order = "create_date desc"
+
+    name = fields.Char("File", readonly=True)
+    file = fields.Binary("Excel File", attachment=True, readonly=True)
+    user_id = fields.Many2one("res.users", string="Imported By", default=lambda self: self.env.user, readonly=True)
+    state = fields.Selection([
+        ("pending", "Pending"),
+        ("parsing", "Parsing"),
+        ("writing", "Writing"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ], default="pending", readonly=True, index=True)
+    progress = fields.Integer("Progress (%)", readonly=True)
+    attempts = fields.Integer(readonly=True)
+    message = fields.Text(readonly=True)
+    created_count = fields.Integer("Created", readonly=True)
+    updated_count = fields.Integer("Updated", readonly=True)
+    unchanged_count = fields.Integer("Unchanged", readonly=True)
+    error_count = fields.Integer("Errors", readonly=True)
+    created_frmnos = fields.Text("Created FRMNOs", readonly=True)
+    updated_frmnos = fields.Text("Updated FRMNOs", readonly=True)
+    errors = fields.Text(readonly=True)
+
+    # ---------- queue ----------
+    @api.model
+    def cron_process_imports(self, limit=1):
+        """Requeue imports whose worker died, then run pending imports, oldest first."""
+        self._requeue_stale_jobs()
+        # Each import runs in its own cursor, which must see the requeued jobs
+        self.env.cr.commit()
+        for job in self.search([("state", "=", "pending")], order="create_date asc, id asc", limit=limit):
+            job.action_run()
+
+    @api.model
+    def _requeue_stale_jobs(self):
+        """Jobs left parsing/writing by a killed worker (time limit, OOM, restart)
+        go back to pending, or fail after JOB_MAX_ATTEMPTS runs. A job still
+        running is locked by its worker and skipped."""
+        self.flush_model(["state"])
+        self.env.cr.execute("""
+            SELECT id FROM acmst_student_import_log
+             WHERE state IN ('parsing', 'writing')
+               FOR UPDATE SKIP LOCKED
+        """)
+        for job in self.browse([row[0] for row in self.env.cr.fetchall()]):
+            _logger.warning("ACMST import: job %s stalled in %s, attempt %s", job.id, job.state, job.attempts)
+            if job.attempts >= JOB_MAX_ATTEMPTS:
+                job.write({"state": "failed", "message": _("Import stopped before finishing %s times.") % job.attempts})
+            else:
+                job.write({"state": "pending", "progress": 0,
+                           "message": _("Requeued: the worker running this import stopped.")})
+
+    def action_run(self):
+        for job in self.filtered(lambda j: j.state == "pending"):
+            self._run_in_new_cursor(job.id)
+        self.invalidate_recordset()
+        return True
+
+    def action_retry(self):
+        """Queue failed imports for the cron; they resume where they stopped."""
+        jobs = self.filtered(lambda j: j.state == "failed")
+        if jobs:
+            jobs.write({"state": "pending", "progress": 0, "attempts": 0,
+                        "message": _("Queued for retry.")})
+            self.env.ref("acmst_finance.ir_cron_acmst_student_import").sudo()._trigger()
+        return True
+
+    @api.model
+    def _run_in_new_cursor(self, job_id):
+        """
+        Run one import in a dedicated cursor: its progress commits and failure
+        rollback never touch the caller's transaction. The job is claimed with
+        SKIP LOCKED, so a cron and the wizard cannot run it twice. Returns the
+        final (state, message, error count), or None if it was not claimed.
+        """
+        with self.env.registry.cursor() as cr:
+            cr.execute("""
+                SELECT id FROM acmst_student_import_log
+                 WHERE id = %s AND state = 'pending'
+                   FOR UPDATE SKIP LOCKED
+            """, [job_id])
+            if not cr.fetchone():
+                return None
+            job = self.with_env(self.env(cr=cr)).browse(job_id)
+            attempts = job.attempts + 1
+            # Committed along with the first progress update
+            job.attempts = attempts
+            try:
+                job._run_import()
+            except _JobRequeued:
+                cr.rollback()
+                _logger.warning("ACMST import: job %s was requeued while running", job_id)
+                return None
+            except Exception as e:
+                cr.rollback()
+                _logger.exception("ACMST import: job %s failed", job_id)
+                job.write({"state": "failed", "attempts": attempts, "message": _("Import failed: %s") % e})
+                cr.commit()
+            return job.state, job.message, job.error_count
+
+    def _set_progress(self, state, progress, **vals):
+        self.write(dict(vals, state=state, progress=progress))
+        self.env.cr.commit()
+        # Lock the job again for the next transaction of the run
+        self.env.cr.execute("SELECT state FROM acmst_student_import_log WHERE id = %s FOR UPDATE", [self.id])
+        if self.env.cr.fetchone()[0] != state:
+            raise _JobRequeued()
+
+    def _open_file(self):
+        attachment = self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", self._name), ("res_field", "=", "file"), ("res_id", "=", self.id),
+        ], limit=1)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), "rb")
+        return BytesIO(attachment.raw or b"")
+
+    # ---------- pipeline ----------
+    @staticmethod
+    def _diff_updates(Student, updates):
+        """
+        Compare incoming (student id, vals) pairs with the stored values, read
+        in bulk. Returns ({changed vals as sorted tuple: [ids]}, unchanged count):
+        only changed fields are kept, and students sharing the same change are
+        grouped so they can be written together.
+        """
+        changes = {}
+        unchanged = 0
+        if not updates:
+            return changes, unchanged
+        fnames = sorted({f for _id, vals in updates for f in vals})
+        for i in range(0, len(updates), DIFF_READ_BATCH):
+            batch = updates[i:i + DIFF_READ_BATCH]
+            current = {r["id"]: r for r in Student.browse([rec_id for rec_id, _vals in batch]).read(fnames)}
+            for rec_id, vals in batch:
+                cur = current.get(rec_id)
+                if cur is None:
+                    continue
+                diff = tuple(sorted(
+                    (f, v) for f, v in vals.items() if (cur[f] or False) != (v or False)
+                ))
+                if diff:
+                    changes.setdefault(diff, []).append(rec_id)
+                else:
+                    unchanged += 1
+        return changes, unchanged
+
+    def _parse_file(self):
+        """
+        Stage 1: stream the sheet and parse it by chunks.
+        Returns ({frmno: vals}, empty FRMNO rows, invalid SEX rows, rows with a FRMNO).
+        Progress runs from 0 to 50% over this stage.
+        """
+        t0 = time.time()
+        self._set_progress("parsing", 0)
+        with self._open_file() as stream:
+            try:
+                wb = openpyxl.load_workbook(filename=stream, data_only=True, read_only=True)
+            except Exception as e:
+                raise UserError(_("Invalid or corrupted Excel file '%s': %s") % (self.name, e))
+            try:
+                ws = wb.active
+                total = max((ws.max_row or 1) - 1, 1)
+                _logger.info("ACMST import: workbook opened, rows=%s, cols=%s", ws.max_row, ws.max_column)
+
+                # Header, then data rows from the same single pass over the sheet
+                sheet_rows = ws.iter_rows(values_only=True)
+                header_row = next(sheet_rows, None) or ()
+                header = [str(v).strip().upper() if v is not None else "" for v in header_row]
+                try:
+                    converter = RowConverter.from_header(header, COLMAP)
+                except KeyError as e:
+                    raise UserError(_("Missing columns in header: %s") % ", ".join(e.args[0]))
+
+                # --- De-duplicate by FRMNO in-file, keeping the FIRST occurrence ---
+                unique_by_frmno = {}
+                # count: rows with a FRMNO, which reach the de-duplication
+                empty_frm_rows = invalid_sex_rows = count = read_rows = 0
+                for read, (records, empty_frm, invalid_sex) in parse_rows(sheet_rows, converter):
+                    read_rows += read
+                    count += len(records)
+                    empty_frm_rows += empty_frm
+                    invalid_sex_rows += invalid_sex
+                    for rec in records:
+                        unique_by_frmno.setdefault(rec[FRMNO_POS], rec)
+                    self._set_progress("parsing", min(50, 50 * read_rows // total))
+            finally:
+                # Read-only workbooks keep the archive open until closed
+                wb.close()
+        _logger.info(
+            "ACMST import: parse done rows=%s unique_frmno=%s (empty_frm=%s invalid_sex=%s) (%.2fs)",
+            count, len(unique_by_frmno), empty_frm_rows, invalid_sex_rows, time.time() - t0
+        )
+        unique_by_frmno = {fno: dict(zip(FIELDS, rec)) for fno, rec in unique_by_frmno.items()}
+        return unique_by_frmno, empty_frm_rows, invalid_sex_rows, count
+
+    def _run_import(self):
+        """Stage 2: match, create and update students through the ORM cursor."""
+        self.ensure_one()
+        t0 = time.time()
+        _logger.info("ACMST import: START job %s (filename=%s)", self.id, self.name)
+        unique_by_frmno, empty_frm_rows, invalid_sex_rows, count = self._parse_file()
+        self._set_progress("writing", 50)
+
+        Student = self.env["acmst.student"].sudo().with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_notrack=True, acmst_ingestion=True
+        )
+
+        # --- Robust match of existing (string OR integer) ---
+        frmnos_str = set(unique_by_frmno)
+        frmnos_int = {int(fno) for fno in frmnos_str if fno.isdigit()}
+        existing_map = {}  # frmno(str) -> id
+        conds = []
+        if frmnos_str:
+            conds.append(("frmno", "in", list(frmnos_str)))
+        if frmnos_int:
+            conds.append(("frmno", "in", list(frmnos_int)))
+        if conds:
+            domain = conds[0]
+            for extra in conds[1:]:
+                domain = ["|", domain, extra]
+            for stu in Student.search(domain).read(["id", "frmno"]):
+                key = to_text(stu["frmno"])  # normalize to string
+                if key:
+                    existing_map[key] = stu["id"]
+        _logger.info("ACMST import: existing matched=%s (%.2fs)", len(existing_map), time.time() - t0)
+
+        # --- Resume: students written by an earlier run of this job are skipped ---
+        created_frmnos = (self.created_frmnos or "").splitlines()
+        updated_frmnos = (self.updated_frmnos or "").splitlines()
+        resumed_updates = set(updated_frmnos)
+        resumed = set(created_frmnos) | resumed_updates
+        created, updated = self.created_count, self.updated_count
+
+        # --- Split into creates / updates ---
+        to_create, updates = [], []
+        skipped = 0
+        for fno, rec in unique_by_frmno.items():
+            ex_id = existing_map.get(fno)
+            if ex_id and fno in resumed:
+                skipped += 1
+            elif ex_id:
+                updates.append((ex_id, rec))
+            else:
+                to_create.append(rec)
+        total = max(len(unique_by_frmno), 1)
+
+        _logger.info(
+            "ACMST import: will create=%s update=%s (deduped_in_file=%s, resumed=%s) (%.2fs)",
+            len(to_create), len(updates), count - len(unique_by_frmno), skipped, time.time() - t0
+        )
+
+        processed = 0
+        done = skipped
+        errors = []
+        frmno_by_id = {rec_id: rec["frmno"] for rec_id, rec in updates}
+
+        def checkpoint():
+            # Counters are committed with the progress, for a rerun to resume from
+            self._set_progress(
+                "writing", 50 + 50 * done // total,
+                created_count=created, updated_count=updated,
+                created_frmnos="\n".join(created_frmnos), updated_frmnos="\n".join(updated_frmnos),
+            )
+            _logger.info("ACMST import: progress created=%s updated=%s (%.2fs)",
+                         created, updated, time.time() - t0)
+
+        # --- Batch creates ---
+        while to_create:
+            chunk = to_create[:BATCH_CREATE]
+            del to_create[:BATCH_CREATE]
+            try:
+                with self.env.cr.savepoint():
+                    Student.create(chunk)
+                created += len(chunk)
+                created_frmnos.extend(vals["frmno"] for vals in chunk)
+            except Exception:
+                # Per-row fallback
+                for vals in chunk:
+                    try:
+                        with self.env.cr.savepoint():
+                            Student.create(vals)
+                        created += 1
+                        created_frmnos.append(vals["frmno"])
+                    except Exception as ee:
+                        errors.append(_("Create failed (FRMNO %s): %s") % (vals.get("frmno"), ee))
+            processed += len(chunk)
+            done += len(chunk)
+            if processed >= COMMIT_EVERY:
+                checkpoint()
+                processed = 0
+
+        # --- Updates: diff against current values, write only what changed ---
+        # Partners are synced once for all changed students afterwards
+        changes, unchanged = self._diff_updates(Student, updates)
+        done += unchanged
+        StudentNoSync = Student.with_context(acmst_skip_partner_sync=True)
+        for vals, ids in changes.items():
+            vals = dict(vals)
+            for i in range(0, len(ids), BATCH_UPDATE):
+                chunk_ids = ids[i:i + BATCH_UPDATE]
+                try:
+                    with self.env.cr.savepoint():
+                        StudentNoSync.browse(chunk_ids).write(vals)
+                    updated += len(chunk_ids)
+                    updated_frmnos.extend(frmno_by_id[rec_id] for rec_id in chunk_ids)
+                except Exception:
+                    # Per-row fallback
+                    for rec_id in chunk_ids:
+                        try:
+                            with self.env.cr.savepoint():
+                                StudentNoSync.browse(rec_id).write(vals)
+                            updated += 1
+                            updated_frmnos.append(frmno_by_id[rec_id])
+                        except Exception as e:
+                            errors.append(_("Update failed (ID %s): %s") % (rec_id, e))
+                processed += len(chunk_ids)
+                done += len(chunk_ids)
+                if processed >= COMMIT_EVERY:
+                    checkpoint()
+                    processed = 0
+
+        # Students updated by an earlier run were never synced: that run
+        # stopped before this step
+        changed_ids = [rec_id for ids in changes.values() for rec_id in ids]
+        changed_ids += [existing_map[fno] for fno in resumed_updates if fno in existing_map]
+        for i in range(0, len(changed_ids), BATCH_UPDATE):
+            try:
+                with self.env.cr.savepoint():
+                    Student.browse(changed_ids[i:i + BATCH_UPDATE]).filtered("partner_id")._sync_partners()
+            except Exception as e:
+                errors.append(_("Partner sync failed: %s") % e)
+
+        # --- Summary ---
+        extra = []
+        if unchanged:
+            extra.append(_("unchanged rows skipped: %s") % unchanged)
+        if empty_frm_rows:
+            extra.append(_("empty FRMNO rows skipped: %s") % empty_frm_rows)
+        if invalid_sex_rows:
+            extra.append(_("rows with invalid SEX: %s") % invalid_sex_rows)
+        msg = _("Import finished: %(c)s created, %(u)s updated", c=created, u=updated)
+        if extra:
+            msg += "\n" + " • ".join(extra)
+        if errors:
+            msg += _("\nSome rows were skipped:\n- ") + "\n- ".join(errors[:10])
+            if len(errors) > 10:
+                msg += _("\n(and %s more...)") % (len(errors) - 10)
+
+        self.write({
+            "state": "done",
+            "progress": 100,
+            "message": msg,
+            "created_count": created,
+            "updated_count": updated,
+            "unchanged_count": unchanged,
+            "error_count": len(errors),
+            "created_frmnos": "\n".join(created_frmnos),
+            "updated_frmnos": "\n".join(updated_frmnos),
+            "errors": "\n".join(errors),
+        })
+        self.env.cr.commit()
+        _logger.info("ACMST import: DONE created=%s updated=%s unchanged=%s errors=%s (%.2fs)",
+                     created, updated, unchanged, len(errors), time.time() - t0)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Parsing stage of the student Excel import.
+
+Nothing in this module touches the ORM or the database: sheet rows are turned
+into compact value tuples here, chunk by chunk, and the import job then writes
+them through the Odoo cursor.
+"""
+from itertools import islice
+from operator import itemgetter
+
+# Excel header -> acmst.student field
+COLMAP = {
+    "FRMNO": "frmno",
+    "FAC": "fac",
+    "UNIV_ID": "univ_id",
+    "N1": "n1",
+    "N2": "n2",
+    "N3": "n3",
+    "N4": "n4",
+    "SCNAME": "scname",
+    "GOBNO": "gobno",
+    "FACNAME": "facname",
+    "GOBOLS": "gobols",
+    "YEAR": "year",
+    "NATIONAL_ID": "national_id",
+    "SEX": "sex",
+    "UNIVERSITY": "university",
+}
+# Order of the values in a parsed record tuple
+FIELDS = tuple(COLMAP.values())
+FRMNO_POS = FIELDS.index("frmno")
+SEX_POS = FIELDS.index("sex")
+
+# Rows parsed between two progress updates of the import job
+PARSE_CHUNK_ROWS = 5000
+
+
+# SEX cell -> selection value. In your sheet: 2 => male (m), 1 => female (f).
+# Numbers are keyed as-is (1 == 1.0 in a dict), text lowercased and stripped.
+SEX_CODES = {
+    2: "m", "2": "m", "٢": "m", "2.0": "m", "m": "m", "male": "m", "ذكر": "m", "زكر": "m",
+    1: "f", "1": "f", "١": "f", "1.0": "f", "f": "f", "female": "f", "انثى": "f", "أنثى": "f", "انثي": "f",
+}
+_SEX_BY_NUMBER = {2: "m", 1: "f"}
+
+
+def to_text(val):
+    if val is None:
+        return False
+    cls = type(val)
+    if cls is str:
+        return val.strip()
+    if cls is float or isinstance(val, float):
+        return str(int(val)) if val.is_integer() else str(val)
+    return str(val).strip()
+
+
+def map_sex(val):
+    """Map an Excel cell to 'm'/'f', or False if empty/unknown."""
+    if val is None:
+        return False
+    try:
+        code = SEX_CODES.get(val)
+    except TypeError:  # unhashable cell value
+        code = None
+    if code:
+        return code
+
+    # رقم (int/float) غير 1 و 2 بالضبط، مثلاً 2.4
+    if isinstance(val, (int, float)):
+        try:
+            return _SEX_BY_NUMBER.get(int(val), False)
+        except (OverflowError, ValueError):
+            return False
+
+    # كنص
+    s = str(val).strip()
+    if not s:
+        return False
+    code = SEX_CODES.get(s.lower())
+    if code:
+        return code
+
+    # محاولة أخيرة لو نص رقم
+    try:
+        return _SEX_BY_NUMBER.get(int(float(s)), False)
+    except (OverflowError, ValueError):
+        return False
+
+
+class RowConverter:
+    """
+    Converts a sheet row tuple into a record tuple ordered as the column map,
+    in one pass. Compiled once per import from the header and the column map:
+    the mapped cells are picked with a single itemgetter, every column goes
+    through to_text and the SEX column through map_sex.
+    """
+    __slots__ = ("positions", "sex_pos", "width", "pick")
+
+    def __init__(self, positions, sex_pos=SEX_POS):
+        self.positions = tuple(positions)
+        self.sex_pos = sex_pos
+        self.width = max(self.positions) + 1
+        self.pick = itemgetter(*self.positions, self.positions[sex_pos])
+
+    @classmethod
+    def from_header(cls, header, colmap=COLMAP):
+        """Raise KeyError listing the colmap headers missing from ``header``."""
+        index = {}
+        for i, title in enumerate(header):
+            index.setdefault(title, i)
+        missing = [h for h in colmap if h not in index]
+        if missing:
+            raise KeyError(missing)
+        return cls([index[h] for h in colmap], list(colmap).index("SEX"))
+
+    def __call__(self, row):
+        """Return (record tuple, raw SEX cell)."""
+        if len(row) < self.width:
+            row = tuple(row) + (None,) * (self.width - len(row))
+        *cells, sex_cell = self.pick(row)
+        rec = list(map(to_text, cells))
+        rec[self.sex_pos] = map_sex(sex_cell)
+        return tuple(rec), sex_cell
+
+
+def parse_chunk(rows, converter):
+    """
+    Convert raw sheet rows with a compiled RowConverter. Returns (records,
+    empty_frm_rows, invalid_sex_rows) where records are value tuples ordered
+    as FIELDS, in file order.
+    """
+    records = []
+    empty_frm_rows = invalid_sex_rows = 0
+    for row in rows:
+        rec, sex_cell = converter(row)
+
+        # سطر فاضي بالكامل
+        if not any(rec):
+            continue
+
+        # FRMNO إجباري
+        if not rec[FRMNO_POS]:
+            empty_frm_rows += 1
+            continue
+
+        # اعتبره "invalid" فقط إذا كانت الخلية غير فاضية فعلاً لكن الماب رجّع False
+        if rec[converter.sex_pos] is False and sex_cell is not None and str(sex_cell).strip() != "":
+            invalid_sex_rows += 1
+
+        records.append(rec)
+    return records, empty_frm_rows, invalid_sex_rows
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_rows(rows, converter, chunk_size=PARSE_CHUNK_ROWS):
+    """
+    Parse a stream of sheet rows by chunks. Yields (rows read, parse_chunk
+    result) per chunk, in file order; the sheet is never read ahead of the
+    chunk being parsed.
+    """
+    for chunk in _chunks(rows, chunk_size):
+        yield len(chunk), parse_chunk(chunk, converter)
@@ -0,0 +1,145 @@
+"""Micro-benchmark for the student import row converters (models/student_import_parse.py).
+
+Runs without Odoo:
+
+    python3 custom_addons/acmst_finance/scripts/bench_row_converters.py [N]
+
+Builds a synthetic sheet of N (default 100000) rows shaped like the student
+Excel export (numeric FRMNOs as floats, Arabic names, SEX as 1/2 numbers,
+Arabic digits and words, blanks and short rows), checks the compiled
+RowConverter against the previous per-cell conversion, and prints timings for:
+  - sex legacy / sex lookup: the SEX column alone, previous _map_sex against
+    the SEX_CODES lookup
+  - legacy: _to_text/_map_sex per cell through a header index dict
+  - converter: RowConverter over whole row tuples
+  - parse_rows: the full parse stage, converter plus filtering by chunks
+"""
+import importlib.util
+import os
+import random
+import sys
+import time
+
+_PARSE = os.path.join(os.path.dirname(__file__), '..', 'models', 'student_import_parse.py')
+_spec = importlib.util.spec_from_file_location('acmst_finance_student_import_parse', _PARSE)
+parse = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(parse)
+
+
+def legacy_to_text(val):
+    if val is None:
+        return False
+    if isinstance(val, float):
+        return str(int(val)) if val.is_integer() else str(val)
+    return str(val).strip()
+
+
+def legacy_map_sex(val):
+    if val is None:
+        return False
+    if isinstance(val, (int, float)):
+        try:
+            n = int(val)
+            if n == 2:
+                return "m"
+            if n == 1:
+                return "f"
+        except Exception:
+            pass
+    s = str(val).strip()
+    if not s:
+        return False
+    sl = s.lower()
+    male_codes = {"2", "٢", "2.0", "m", "male", "ذكر", "زكر"}
+    female_codes = {"1", "١", "1.0", "f", "female", "انثى", "أنثى", "انثي"}
+    if sl in male_codes:
+        return "m"
+    if sl in female_codes:
+        return "f"
+    try:
+        n = int(float(s))
+        if n == 2:
+            return "m"
+        if n == 1:
+            return "f"
+    except Exception:
+        pass
+    return False
+
+
+def legacy_convert(rows, idx):
+    out = []
+    for row in rows:
+        rec = {}
+        for h, f in parse.COLMAP.items():
+            val = row[idx[h]] if idx[h] < len(row) else None
+            rec[f] = legacy_map_sex(val) if h == "SEX" else legacy_to_text(val)
+        out.append(tuple(rec.values()))
+    return out
+
+
+NAMES = ['محمد', 'أحمد', 'إبراهيم', 'آمنة', 'فاطمة', 'عبد الله', 'مصطفى', 'خديجة', 'حسن', 'علي', 'عمر']
+FACULTIES = ['Medicine', 'Engineering', 'Computer Science', 'Business']
+SEX_CELLS = [1, 2, 1.0, 2.0, '1', '2', ' ٢ ', 'ذكر', 'أنثى', 'Male', 'f', '', None, 'x', 2.4]
+# Extra columns interleaved with the mapped ones, as in the real export
+HEADER = ['ROWID', *parse.COLMAP, 'NOTES']
+
+
+def build_sheet(n, seed=17):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        row = [
+            i,
+            float(200000 + rnd.randrange(n)) if rnd.random() > 0.01 else None,  # FRMNO
+            rnd.randrange(1, 30),                       # FAC
+            f" {rnd.randrange(10 ** 8)} ",              # UNIV_ID
+            rnd.choice(NAMES), rnd.choice(NAMES), rnd.choice(NAMES), rnd.choice(NAMES),
+            'مدرسة ' + rnd.choice(NAMES),              # SCNAME
+            float(rnd.randrange(10 ** 6)),              # GOBNO
+            rnd.choice(FACULTIES),                      # FACNAME
+            rnd.uniform(50, 100),                       # GOBOLS
+            rnd.choice([2022, 2023, 2024.0]),           # YEAR
+            str(rnd.randrange(10 ** 10)),               # NATIONAL_ID
+            rnd.choice(SEX_CELLS),                      # SEX
+            'ACMST',                                    # UNIVERSITY
+            '',
+        ]
+        if rnd.random() < 0.02:
+            row = row[:rnd.randrange(2, len(row))]
+        rows.append(tuple(row))
+    return rows
+
+
+def timed(label, fn, n, repeat=3):
+    dt = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = min(dt, time.perf_counter() - t0)
+    print(f"{label:<22} {dt * 1000:9.1f} ms  {n / dt:12,.0f} rows/s")
+    return dt
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = build_sheet(n)
+    idx = {h: HEADER.index(h) for h in parse.COLMAP}
+    converter = parse.RowConverter.from_header(HEADER)
+    assert [converter(row)[0] for row in rows] == legacy_convert(rows, idx)
+
+    sex_cells = [row[idx["SEX"]] if idx["SEX"] < len(row) else None for row in rows]
+    assert list(map(parse.map_sex, sex_cells)) == list(map(legacy_map_sex, sex_cells))
+
+    print(f"sheet: {n} rows x {len(HEADER)} columns, {len(parse.COLMAP)} mapped")
+    sex_base = timed('sex legacy', lambda: list(map(legacy_map_sex, sex_cells)), n)
+    sex_new = timed('sex lookup', lambda: list(map(parse.map_sex, sex_cells)), n)
+    base = timed('legacy', lambda: legacy_convert(rows, idx), n)
+    conv = timed('converter', lambda: [converter(row) for row in rows], n)
+    parsed = timed('parse_rows', lambda: list(parse.parse_rows(rows, converter)), n)
+    print(f"speedup vs legacy: sex x{sex_base / sex_new:.1f}, converter x{base / conv:.1f}, "
+          f"parse x{base / parsed:.1f}")
+
+
+if __name__ == '__main__':
+    main()